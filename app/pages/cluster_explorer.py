@@ -12,6 +12,7 @@ import pandas as pd
 from dash import Input, Output, State, callback, dcc, html
 from src.basics import FrameOperations
 from src.decomposition import DataDecomposition
+from src.metadata import feature_groups_index
 from src.plots import MultiDimPlot
 from src.statistics import ClusterAnalysis, Stats
 from src.utils import clean_gene_probe_id, load_config, response_multidim, send_slack_msg
@@ -402,6 +403,21 @@ def main_multidim_browser(
             )
 
         loader = FrameOperations(data_type, sample_types)
+
+        # variables absent in any of sample types are dropped by load_many, so less than 5 variables present in all
+        # sample types are rejected below anyway, sample types without any of variables are reported by load_many
+        present = feature_groups_index.present_in(loader.platform, variables, sample_types)
+        if (
+            present is not None
+            and all(present.values())
+            and len(set(variables).intersection(*present.values())) < 5
+        ):
+            msg = "Less than 5 variables in this set of sample types, use 1-D browser instead."
+            send_slack_msg("Multidimensional browser", msg)
+            logger.info(msg)
+
+            return EmptyFig, EmptyFig, False, msg, True, "", ""
+
         data, msg = loader.load_many(variables)
 
         if data.empty:
@@ -1,14 +1,19 @@
+import io
 import typing as t
 import logging
+from os.path import exists, getmtime, join
+from urllib.parse import urlencode
+
 import dash
 
 logger = logging.getLogger(__name__)
 dash.register_page(__name__)
 
+import flask
 import pandas as pd
 import dash_loading_spinners as dls
 import dash_bootstrap_components as dbc
-from dash import Input, Output, State, callback, dcc, html
+from dash import Input, Output, callback, dcc, html
 from src.basics import FrameOperations
 from src.utils import load_config, send_slack_msg, temp_file_path
 
@@ -16,6 +21,13 @@ EmptyFig = {}
 config = load_config()
 global_metadata = pd.read_pickle(config["global_metadata"])
 
+# download format -> extension and mimetype of pre-built artifact
+ARTIFACTS = {
+    "csv": ("csv.gz", "application/gzip"),
+    "parquet": ("parquet", "application/vnd.apache.parquet"),
+    "arrow": ("arrow", "application/vnd.apache.arrow.file"),
+}
+
 app = dash.get_app()
 
 layout = dbc.Container(
@@ -35,9 +47,9 @@ layout = dbc.Container(
                     ],
                     xs=12,
                     sm=12,
-                    md=5,
-                    lg=5,
-                    xl=5,
+                    md=4,
+                    lg=4,
+                    xl=4,
                 ),
                 dbc.Col(
                     [
@@ -55,9 +67,30 @@ layout = dbc.Container(
                     ],
                     xs=12,
                     sm=12,
-                    md=5,
-                    lg=5,
-                    xl=5,
+                    md=4,
+                    lg=4,
+                    xl=4,
+                ),
+                dbc.Col(
+                    [
+                        html.Label("File format", htmlFor="format-downloader"),
+                        dcc.Dropdown(
+                            id="format-downloader",
+                            options=[
+                                {"label": "CSV [gzip]", "value": "csv"},
+                                {"label": "Parquet", "value": "parquet"},
+                                {"label": "Arrow IPC", "value": "arrow"},
+                            ],
+                            value="csv",
+                            clearable=False,
+                            multi=False,
+                        ),
+                    ],
+                    xs=12,
+                    sm=12,
+                    md=2,
+                    lg=2,
+                    xl=2,
                 ),
                 dbc.Col(
                     [
@@ -67,8 +100,10 @@ layout = dbc.Container(
                             id="download-button-downloader",
                             color="danger",
                             className="button-interact",
+                            href="",
+                            external_link=True,
+                            disabled=True,
                         ),
-                        dcc.Download(id="download-dataset-downloader"),
                     ]
                 ),
                 dbc.Row(
@@ -124,30 +159,99 @@ def update_groups_options(
 
 
 @callback(
-    Output("download-dataset-downloader", "data"),
-    Output("progress-downloader", "children"),
-    State("data-type-downloader", "value"),
-    State("category-downloader", "value"),
-    Input("download-button-downloader", "n_clicks"),
+    Output("download-button-downloader", "href"),
+    Output("download-button-downloader", "disabled"),
+    Input("data-type-downloader", "value"),
+    Input("category-downloader", "value"),
+    Input("format-downloader", "value"),
     prevent_initial_call=True,
 )
-def download_dataset(data_type: str, sample_type: str, _: int) -> t.Tuple[t.Any, str]:
+def update_download_link(data_type: str, sample_type: str, file_format: str) -> t.Tuple[str, bool]:
     """
-    Function to load and return a specific dataset from local data repository.
+    Function to point download button to download route for selected dataset and file format.
 
     :param data_type:
     :param sample_type:
-    :param _:
-    :return:
+    :param file_format:
+    :return str, boolean:
     """
+    if data_type and sample_type:
+        query = urlencode(
+            {"data_type": data_type, "sample_type": sample_type, "format": file_format or "csv"}
+        )
+        return f"/download/dataset?{query}", False
 
-    loader = FrameOperations(data_type, sample_type)
+    return "", True
+
+
+@app.server.route("/download/dataset")
+def download_dataset() -> flask.Response:
+    """
+    Function to serve a specific dataset from local data repository.
+    Pre-built artifact [gzip CSV, parquet or Arrow IPC, exported by the pipeline] is sent as a static file, with
+    ETag, Last-Modified and Range support. If artifact is not available, CSV is streamed: dataset is read and
+    encoded one row group at a time, so memory usage does not depend on dataset size. Parquet and Arrow IPC files
+    stored without value encoding are sent as they are, otherwise they are written on request.
+
+    :return flask.Response:
+    """
+    data_type = flask.request.args.get("data_type", "")
+    sample_type = flask.request.args.get("sample_type", "")
+    file_format = flask.request.args.get("format", "csv")
+
+    if data_type == "Expression [RNA-seq]":
+        options = global_metadata["Expression_files_present"]
+    elif data_type == "Methylation [450K/EPIC]":
+        options = global_metadata["Methylation_files_present"]
+    else:
+        options = []
 
-    dataset = loader.load_whole_dataset()
-    name = f"{data_type} - {sample_type}"
+    if sample_type not in options or file_format not in ARTIFACTS:
+        flask.abort(404)
 
-    msg = f"Requested dataset: {name}"
+    loader = FrameOperations(data_type, sample_type)
+    name = f"{data_type} - {sample_type}".replace("/", "-")
+
+    msg = f"Requested dataset: {name} [{file_format}]"
     send_slack_msg("Datasets browser", msg)
     logger.info(msg)
 
-    return dcc.send_data_frame(dataset.to_csv, f"{name}.csv"), ""
+    extension, mimetype = ARTIFACTS[file_format]
+    artifact = join(config["downloads_path"], sample_type, f"{loader.platform}.{extension}")
+
+    if exists(artifact):
+        return flask.send_file(
+            artifact,
+            mimetype=mimetype,
+            as_attachment=True,
+            download_name=f"{name}.{extension}",
+            conditional=True,
+            etag=True,
+            last_modified=getmtime(artifact),
+        )
+
+    if file_format != "csv":
+        source = loader.stored_file(extension)
+        if source is None:
+            return flask.send_file(
+                io.BytesIO(loader.export_bytes(file_format)),
+                mimetype=mimetype,
+                as_attachment=True,
+                download_name=f"{name}.{extension}",
+            )
+
+        return flask.send_file(
+            source,
+            mimetype=mimetype,
+            as_attachment=True,
+            download_name=f"{name}.{extension}",
+            conditional=True,
+            etag=True,
+            last_modified=getmtime(source),
+        )
+
+    return flask.Response(
+        flask.stream_with_context(loader.iter_csv()),
+        mimetype="text/csv",
+        headers={"Content-Disposition": f'attachment; filename="{name}.csv"'},
+    )
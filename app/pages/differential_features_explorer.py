@@ -1,5 +1,6 @@
 import logging
 import typing as t
+from os.path import exists, join
 
 import dash
 import diskcache
@@ -8,16 +9,27 @@ logger = logging.getLogger(__name__)
 dash.register_page(__name__)
 
 import dash_bootstrap_components as dbc
-import dash_loading_spinners as dls
 import numpy as np
 import pandas as pd
 from dash import Input, Output, State, callback, dcc, html
 from dash.long_callback import DiskcacheLongCallbackManager
 from src.basics import FrameOperations
-from src.differential_features import DifferentialFeatures
+from src.differential_features import (
+    DifferentialFeatures,
+    apply_thresholds,
+    read_precomputed_records,
+    swap_groups,
+)
+from src.metadata import metadata_service
 from src.plots import Plot
 from src.statistics import Stats
-from src.utils import load_config, send_slack_msg, temp_file_path
+from src.utils import (
+    load_config,
+    repository_version,
+    send_slack_msg,
+    temp_file_path,
+    write_parquet,
+)
 
 EmptyFig = {}
 config = load_config()
@@ -157,19 +169,8 @@ layout = dbc.Container(
             ],
         ),
         html.Br(),
-        dbc.Row(
-            dbc.Col(
-                dls.Hash(
-                    html.Div(id="progress-dfeatures-browser"),
-                    color="#FF0000",
-                    debounce=30,
-                    speed_multiplier=2,
-                    size=100,
-                    fullscreen=True,
-                    show_initially=False,
-                )
-            )
-        ),
+        dbc.Row(dbc.Col(html.Div(id="progress-dfeatures-browser"))),
+        dcc.Store(id="result-dfeatures-browser"),
         html.Br(),
         dbc.Row(
             dbc.Collapse(
@@ -319,32 +320,78 @@ def update_min_effect_slider(
     return True, 0.0, 0.0, 0.0, 0.0
 
 
+def find_results(data_type: str, group_A: str, group_B: str, version: str) -> t.Optional[str]:
+    """
+    Function to find cached results of group_A vs group_B comparison. If only results of the swapped comparison
+    [group_B vs group_A] are cached, results are derived from them and cached. Otherwise results store
+    precomputed by the data processing pipeline is checked, records found there are cached as well.
+
+    :param data_type:
+    :param group_A:
+    :param group_B:
+    :param version: version of data repository
+    :return Optional[str]: path to cached results
+    """
+    path = temp_file_path(data_type, group_A, group_B, version)
+    if exists(path):
+        return path
+
+    swapped_path = temp_file_path(data_type, group_B, group_A, version)
+    if exists(swapped_path):
+        write_parquet(swap_groups(pd.read_parquet(swapped_path), group_B, group_A), path)
+        return path
+
+    platform = FrameOperations(data_type, [group_A, group_B]).platform
+    records = read_precomputed_records(
+        join(config["differential_store"], f"{platform}.parquet"), group_A, group_B
+    )
+    if records is not None:
+        write_parquet(records, path)
+        return path
+
+    return None
+
+
+def count_samples(data_type: str, groups: t.List[str]) -> pd.Series:
+    """
+    Function to build sample frame [sample -> sample type] of compared groups from their metadata records.
+
+    :param data_type:
+    :param groups:
+    :return pd.Series:
+    """
+    key = "expressionSamples" if data_type == "Expression [RNA-seq]" else "methylationSamples"
+    samples = [(group, sample) for group in groups for sample in metadata_service.get(group)[key]]
+
+    return pd.Series(
+        [group for group, _ in samples], index=[sample for _, sample in samples], name="SampleType"
+    )
+
+
 @callback(
     Output("download-dfeatures-frame", "data"),
-    State("data-type-dfeatures-browser", "value"),
-    State("groupA-dfeatures-browser", "value"),
-    State("groupB-dfeatures-browser", "value"),
+    State("result-dfeatures-browser", "data"),
     State("alpha-dfeatures-browser", "value"),
     State("min-effect-dfeatures-browser", "value"),
     Input("download-dfeatures-button", "n_clicks"),
     prevent_initial_call=True,
 )
 def return_statistic_frame(
-    data_type: str, group_A: str, group_B: str, alpha: float, effect: float, n_clicks: int
+    result: t.Optional[dict], alpha: float, effect: float, n_clicks: int
 ) -> pd.DataFrame:
     """
     Function sends frame with statistics to a user.
 
-    :param data_type:
-    :param group_A:
-    :param group_B:
+    :param result: location of cached results
     :param alpha:
     :param effect:
     :param n_clicks:
     :return pd.DataFrame:
     """
-    path = temp_file_path(data_type, group_A, group_B, alpha, effect)
-    frame = pd.read_parquet(path)
+    if not result or not exists(result["path"]):
+        return dash.no_update
+
+    frame = apply_thresholds(pd.read_parquet(result["path"]), result["data_type"], alpha, effect)
 
     frame = frame.rename(
         columns={"-log10(p-value)": "negative log10(p-value)", "-log10(FDR)": "negative log10(FDR)"}
@@ -352,14 +399,114 @@ def return_statistic_frame(
     return dcc.send_data_frame(frame.to_csv, "summary_table.csv")
 
 
-@app.long_callback(
+@callback(
     Output("plot-dfeatures-browser", "figure"),
     Output("cnt-plot-dfeatures-browser", "figure"),
+    Input("result-dfeatures-browser", "data"),
+    Input("alpha-dfeatures-browser", "value"),
+    Input("min-effect-dfeatures-browser", "value"),
+    prevent_initial_call=True,
+)
+def update_dfeatures_plots(result: t.Optional[dict], alpha: float, effect_size: float):
+    """
+    Function to classify cached results using current thresholds and draw volcano and pie plots.
+    Analysis is not repeated when alpha or minimum effect size changes.
+
+    :param result: location of cached results
+    :param alpha:
+    :param effect_size:
+    :return Fig, Fig:
+    """
+    if not result or not exists(result["path"]) or alpha is None or effect_size is None:
+        return EmptyFig, EmptyFig
+
+    data_type = result["data_type"]
+    results = apply_thresholds(pd.read_parquet(result["path"]), data_type, alpha, effect_size)
+
+    return draw_results(results, data_type, alpha, effect_size)
+
+
+def draw_results(results: pd.DataFrame, data_type: str, alpha: float, effect_size: float):
+    """
+    Function to draw volcano and pie plots of classified results [output of apply_thresholds].
+
+    :param results:
+    :param data_type:
+    :param alpha:
+    :param effect_size:
+    :return Fig, Fig:
+    """
+    if data_type == "Expression [RNA-seq]":
+        plot = Plot(results, "log2(FC)", "-log10(FDR)", None, None)
+        fig = plot.volcanoplot(x_border=effect_size, y_border=-np.log10(alpha))
+    else:
+        plot = Plot(results, "delta", "-log10(FDR)", None, None)
+        fig = plot.volcanoplot(x_border=effect_size, y_border=-np.log10(alpha))
+
+    return fig, plot.pieplot()
+
+
+def partial_results(
+    records: pd.DataFrame,
+    data_type: str,
+    alpha: t.Optional[float],
+    effect_size: t.Optional[float],
+    completed: int,
+    total: int,
+) -> html.Div:
+    """
+    Function to render progress of running analysis with results of features tested so far [the most variable
+    features are tested first]. FDR is computed over tested features only, so results are marked as partial.
+
+    :param records: records of completed chunks
+    :param data_type:
+    :param alpha:
+    :param effect_size:
+    :param completed: number of completed chunks
+    :param total: number of chunks
+    :return html.Div:
+    """
+    progress = dbc.Progress(
+        value=completed,
+        max=total,
+        label=f"{completed}/{total} chunks",
+        striped=True,
+        animated=True,
+    )
+    if alpha is None or effect_size is None:
+        return html.Div(progress)
+
+    results = apply_thresholds(records, data_type, alpha, effect_size)
+    count = results["DEG/DMP"].sum()
+    fig, pie = draw_results(results, data_type, alpha, effect_size)
+
+    return html.Div(
+        [
+            progress,
+            html.Br(),
+            html.P(
+                [
+                    dbc.Badge("partial", color="warning", className="me-1"),
+                    f"{count} differential features among {len(results)} most variable features "
+                    "tested so far, FDR computed over tested features.",
+                ]
+            ),
+            dbc.Row(
+                [
+                    dbc.Col(dcc.Graph(figure=fig), xs=11, sm=11, md=6, lg=6, xl=6),
+                    dbc.Col(dcc.Graph(figure=pie), xs=11, sm=11, md=6, lg=6, xl=6),
+                ]
+            ),
+        ]
+    )
+
+
+@app.long_callback(
     Output("result-section-dfeatures-browser", "is_open"),
     Output("msg-dfeatures-browser", "children"),
     Output("msg-section-dfeatures-browser", "is_open"),
-    Output("progress-dfeatures-browser", "children"),
     Output("count-table-dfeatures-browser", "children"),
+    Output("result-dfeatures-browser", "data"),
     State("data-type-dfeatures-browser", "value"),
     State("groupA-dfeatures-browser", "value"),
     State("groupB-dfeatures-browser", "value"),
@@ -367,21 +514,36 @@ def return_statistic_frame(
     State("min-effect-dfeatures-browser", "value"),
     Input("submit-dfeatures-browser", "n_clicks"),
     manager=long_callback_manager,
+    progress=[Output("progress-dfeatures-browser", "children")],
+    progress_default=[""],
+    running=[(Output("submit-dfeatures-browser", "disabled"), True, False)],
     prevent_initial_call=True,
 )
 def main_dfeatures_browser(
-    data_type: str, group_A: str, group_B: str, alpha: float, effect_size: float, _: int
+    set_progress: t.Callable,
+    data_type: str,
+    group_A: str,
+    group_B: str,
+    alpha: float,
+    effect_size: float,
+    _: int,
 ):
     """
     Function to perform DE/DM analysis.
+    Features are tested in chunks on a pool of processes, the most variable features first. After each completed
+    chunk progress is reported along with partial volcano and pie plots of features tested so far, progress
+    section is cleared [progress_default] when the callback completes.
+    Threshold independent results are cached per data type, compared groups and repository version,
+    results of swapped comparison are reused, plots are drawn from cached results by update_dfeatures_plots.
 
+    :param set_progress:
     :param data_type:
     :param group_A:
     :param group_B:
     :param alpha:
     :param effect_size:
     :param _:
-    :return Optional[Fig, boolean, str, boolean, str, pd.DataFrame]:
+    :return Optional[boolean, str, boolean, pd.DataFrame, dict]:
     """
     if data_type and group_A and group_B:
 
@@ -389,42 +551,40 @@ def main_dfeatures_browser(
             msg = f"Can not compare two identical groups of samples - '{group_A}' and '{group_B}'."
             send_slack_msg("Differential features browser", msg)
             return (
-                EmptyFig,
-                EmptyFig,
                 False,
                 msg,
                 True,
                 "",
-                "",
+                None,
             )
 
-        loader = FrameOperations(data_type, [group_A, group_B])
-        data, sample_frame = loader.load_mvf()
-
-        diffF = DifferentialFeatures(
-            data_type, data, sample_frame, group_A, group_B, alpha, effect_size
-        )
-        diffF.identify_differential_features()
-        diffF.build_statistics_frame()
+        version = repository_version(config["global_metadata"])
+        path = find_results(data_type, group_A, group_B, version)
 
-        path_to_drop = temp_file_path(data_type, group_A, group_B, alpha, effect_size)
-        diffF.export(path_to_drop)
-        results = diffF.stats_frame
+        if path is None:
+            path = temp_file_path(data_type, group_A, group_B, version)
+            loader = FrameOperations(data_type, [group_A, group_B])
+            data, sample_frame = loader.load_mvf()
 
-        if data_type == "Expression [RNA-seq]":
-            plot = Plot(results, "log2(FC)", "-log10(FDR)", None, None)
-            fig = plot.volcanoplot(x_border=effect_size, y_border=-np.log10(alpha))
-        else:
-            plot = Plot(results, "delta", "-log10(FDR)", None, None)
-            fig = plot.volcanoplot(x_border=effect_size, y_border=-np.log10(alpha))
+            diffF = DifferentialFeatures(
+                data_type, data, sample_frame, group_A, group_B, alpha, effect_size
+            )
+            diffF.identify_differential_features(
+                n_processes=config["dfeatures_processes"],
+                chunk_size=config["dfeatures_chunk_size"],
+                partial=lambda completed, total, records: set_progress(
+                    partial_results(records, data_type, alpha, effect_size, completed, total)
+                ),
+            )
+            diffF.export(path)
 
-        cnt_fig = plot.pieplot()
+        sample_frame = count_samples(data_type, [group_A, group_B])
         count = Stats(sample_frame.to_frame(), "SampleType").get_factor_count
 
         log_info = f"Input: {data_type} - {group_A} - {group_B}"
         send_slack_msg("Differential features browser", log_info)
         logger.info(log_info)
 
-        return fig, cnt_fig, True, "Status: done.", True, "", count
+        return True, "Status: done.", True, count, {"path": path, "data_type": data_type}
 
     return dash.no_update
@@ -11,6 +11,7 @@ import dash_loading_spinners as dls
 import pandas as pd
 from dash import Input, Output, State, callback, dcc, html
 from src.basics import FrameOperations
+from src.metadata import feature_groups_index
 from src.plots import Plot
 from src.statistics import Stats
 from src.utils import clean_gene_probe_id, load_config, send_slack_msg
@@ -56,6 +57,12 @@ layout = dbc.Container(
                             optionHeight=100,
                         ),
                         dbc.FormText("Maximum number of categories is 5."),
+                        dbc.Checklist(
+                            id="all-sample-types-1d-browser",
+                            options=[{"label": "All sample groups", "value": True}],
+                            value=[],
+                            switch=True,
+                        ),
                     ],
                     xs=12,
                     sm=12,
@@ -93,6 +100,25 @@ layout = dbc.Container(
                 ),
             ]
         ),
+        dbc.Row(
+            [
+                html.Label(
+                    "Panel of probes IDs/genes [optional]",
+                    htmlFor="panel-1d-browser",
+                ),
+                dcc.Textarea(
+                    id="panel-1d-browser",
+                    placeholder="Firstly select a data type",
+                    disabled=True,
+                    style={"width": "98%"},
+                ),
+                dbc.FormText(
+                    f"Comma-separated list of up to {config['max_panel_variables']} variables, "
+                    "rendered as small multiples instead of a single variable."
+                ),
+            ],
+            justify="center",
+        ),
         dbc.Row(
             [
                 dbc.Col(
@@ -288,22 +314,34 @@ def update_sample_type_options(
 @callback(
     Output("variable-1d-browser", "disabled"),
     Output("variable-1d-browser", "placeholder"),
+    Output("panel-1d-browser", "disabled"),
+    Output("panel-1d-browser", "placeholder"),
     Input("data-type-1d-browser", "value"),
+    Input("all-sample-types-1d-browser", "value"),
     prevent_initial_call=True,
 )
-def update_input_field(data_type: str) -> t.Tuple[bool, str]:
+def update_input_field(
+    data_type: str, all_sample_types: t.List[bool]
+) -> t.Tuple[bool, str, bool, str]:
     """
-    Function to open or close variable field in the layout.
+    Function to open or close variable and panel fields in the layout.
+    Panel field is closed in all sample groups mode, panels are not available in this mode.
 
     :param data_type:
-    :return boolean, str:
+    :param all_sample_types:
+    :return boolean, str, boolean, str:
     """
     if data_type == "Expression [RNA-seq]":
-        return False, "E.g. BRCA1"
-    if data_type == "Methylation [450K/EPIC]":
-        return False, "E.g. cg07779434"
+        variable_placeholder, panel_placeholder = "E.g. BRCA1", "E.g. BRCA1, BRCA2, TP53"
+    elif data_type == "Methylation [450K/EPIC]":
+        variable_placeholder, panel_placeholder = "E.g. cg07779434", "E.g. cg07779434, cg00000029"
+    else:
+        return True, "Firstly select data type", True, "Firstly select data type"
+
+    if all_sample_types:
+        return False, variable_placeholder, True, "Panels are not available for all sample groups"
 
-    return True, "Firstly select data type"
+    return False, variable_placeholder, False, panel_placeholder
 
 
 @callback(
@@ -320,6 +358,8 @@ def update_input_field(data_type: str) -> t.Tuple[bool, str]:
     State("scaling-method-1d-browser", "value"),
     State("plot-type-1d-browser", "value"),
     State("alpha-type-1d-browser", "value"),
+    State("all-sample-types-1d-browser", "value"),
+    State("panel-1d-browser", "value"),
     Input("submit-1d-browser", "n_clicks"),
     prevent_initial_call=True,
 )
@@ -330,10 +370,15 @@ def main_1d_browser(
     scaling_method: str,
     plot_type: str,
     alpha: float,
+    all_sample_types: t.List[bool],
+    panel: str,
     _: int,
 ):
     """
     Function to perform 1-D analysis.
+    In all sample groups mode variable is read from feature-major store, for every sample group containing it.
+    If panel of variables is provided, all variables are loaded at once and rendered as small multiples
+    [not available in all sample groups mode].
 
     :param sample_types:
     :param data_type:
@@ -341,10 +386,33 @@ def main_1d_browser(
     :param scaling_method:
     :param plot_type:
     :param alpha:
+    :param all_sample_types:
+    :param panel:
     :param _:
     :return Optional[boolean, Fig, boolean, str, pd.DataFrame, pd.DataFrame, str]:
     """
-    if data_type and variable:
+    if data_type and panel and all_sample_types:
+        msg = "Panels are not available in all sample groups mode, switch it off to analyse the panel."
+        send_slack_msg("One dimensional browser", msg)
+        logger.info(msg)
+        return False, EmptyFig, True, msg, "", "", ""
+
+    if data_type and panel and sample_types:
+        return panel_1d_browser(sample_types, data_type, panel, scaling_method, plot_type, alpha)
+
+    if data_type and variable and all_sample_types:
+        variable = clean_gene_probe_id(variable, data_type)
+        loader = FrameOperations(data_type, [])
+        data, msg = loader.load_all_groups_1d(variable)
+
+        if data.empty:
+            send_slack_msg("One dimensional browser", msg)
+            logger.info(msg)
+            return False, EmptyFig, True, msg, "", "", ""
+
+        sample_types = list(data["SampleType"].unique())
+
+    elif data_type and variable and sample_types:
         if len(sample_types) > 5:
             msg = "Exceeded maximum number of sample categories [n>5]."
             send_slack_msg("One dimensional browser", msg)
@@ -361,6 +429,18 @@ def main_1d_browser(
 
         variable = clean_gene_probe_id(variable, data_type)
         loader = FrameOperations(data_type, sample_types)
+
+        present = feature_groups_index.present_in(loader.platform, [variable], sample_types)
+        if present is not None:
+            missing = [sample_type for sample_type in sample_types if not present[sample_type]]
+
+            if missing:
+                feature = "Gene" if data_type == "Expression [RNA-seq]" else "CpG"
+                msg = f"{feature}: '{variable}' not found in '{missing[0]}' repository"
+                send_slack_msg("One dimensional browser", msg)
+                logger.info(msg)
+                return False, EmptyFig, True, msg, "", "", ""
+
         data, msg = loader.load_1d(variable)
 
         if data.empty:
@@ -368,38 +448,42 @@ def main_1d_browser(
             logger.info(msg)
             return False, EmptyFig, True, msg, "", "", ""
 
-        data[variable] = loader.scale(data[variable], scaling_method)
-        figureGenerator = Plot(
-            data,
-            x_axis="SampleType",
-            y_axis=variable,
-            scaling_method=scaling_method,
-            data_type=data_type,
-        )
+    else:
+        return dash.no_update
 
-        if plot_type == "Box":
-            fig = figureGenerator.boxplot()
-        elif plot_type == "Violin":
-            fig = figureGenerator.violinplot()
-        else:
-            fig = figureGenerator.scatterplot()
+    data[variable] = loader.scale(data[variable], scaling_method)
+    figureGenerator = Plot(
+        data,
+        x_axis="SampleType",
+        y_axis=variable,
+        scaling_method=scaling_method,
+        data_type=data_type,
+    )
 
-        stats = Stats(data, "SampleType", alpha=alpha)
-        count = stats.get_factor_count
+    if plot_type == "Box":
+        fig = figureGenerator.boxplot()
+    elif plot_type == "Violin":
+        fig = figureGenerator.violinplot()
+    else:
+        fig = figureGenerator.scatterplot()
 
-        if len(sample_types) > 1:
-            stats.test_for_homoscedasticity(variable)
-            stats.test_normality(variable)
-            stats.post_hoc(variable)
-            post_hoc_frame = stats.export_frame()
+    stats = Stats(data, "SampleType", alpha=alpha)
+    count = stats.get_factor_count
 
-            log_info = (
-                f"Input: {sample_types} - {data_type} - {variable} - {scaling_method} - {plot_type}"
-            )
-            send_slack_msg("One dimensional browser", log_info)
-            logger.info(log_info)
+    if len(sample_types) > 5:
+        log_info = (
+            f"Input: all sample groups - {data_type} - {variable} - {scaling_method} - {plot_type}"
+        )
+        send_slack_msg("One dimensional browser", log_info)
+        logger.info(log_info)
 
-            return True, fig, True, msg, post_hoc_frame, count, ""
+        return True, fig, True, msg, "Applicable only for <= 5 categories.", count, ""
+
+    if len(sample_types) > 1:
+        stats.test_for_homoscedasticity(variable)
+        stats.test_normality(variable)
+        stats.post_hoc(variable)
+        post_hoc_frame = stats.export_frame()
 
         log_info = (
             f"Input: {sample_types} - {data_type} - {variable} - {scaling_method} - {plot_type}"
@@ -407,6 +491,82 @@ def main_1d_browser(
         send_slack_msg("One dimensional browser", log_info)
         logger.info(log_info)
 
-        return True, fig, True, msg, "Applicable only for > 1 categories.", count, ""
+        return True, fig, True, msg, post_hoc_frame, count, ""
+
+    log_info = f"Input: {sample_types} - {data_type} - {variable} - {scaling_method} - {plot_type}"
+    send_slack_msg("One dimensional browser", log_info)
+    logger.info(log_info)
+
+    return True, fig, True, msg, "Applicable only for > 1 categories.", count, ""
+
+
+def panel_1d_browser(
+    sample_types: t.List[str],
+    data_type: str,
+    panel: str,
+    scaling_method: str,
+    plot_type: str,
+    alpha: float,
+):
+    """
+    Function to perform 1-D analysis for panel of variables, rendered as small multiples.
+    Variables are loaded in one pass per sample type, variables not found are reported.
+
+    :param sample_types:
+    :param data_type:
+    :param panel:
+    :param scaling_method:
+    :param plot_type:
+    :param alpha:
+    :return Optional[boolean, Fig, boolean, str, pd.DataFrame, pd.DataFrame, str]:
+    """
+    variables = [clean_gene_probe_id(var, data_type) for var in panel.split(",") if var.strip()]
+    variables = list(dict.fromkeys(variables))
+
+    if len(sample_types) > 5:
+        msg = "Exceeded maximum number of sample categories [n>5]."
+    elif len(variables) > config["max_panel_variables"]:
+        msg = f"Exceeded maximum number of variables [n > {config['max_panel_variables']}]."
+    else:
+        msg = ""
+
+    if msg:
+        send_slack_msg("One dimensional browser", msg)
+        logger.info(msg)
+        return False, EmptyFig, True, msg, "", "", ""
+
+    loader = FrameOperations(data_type, sample_types)
+    data, not_found = loader.load_panel(variables)
+
+    feature = "Gene" if data_type == "Expression [RNA-seq]" else "CpG"
+    msg = [
+        f"{feature}: '{variable}' not found in {', '.join(groups)}"
+        for variable, groups in not_found.items()
+    ]
+    msg = "; ".join(msg) if msg else "Status: done"
+
+    if data.empty:
+        send_slack_msg("One dimensional browser", msg)
+        logger.info(msg)
+        return False, EmptyFig, True, msg, "", "", ""
+
+    for variable in data.columns.drop("SampleType"):
+        data[variable] = loader.scale(data[variable], scaling_method)
+
+    fig = Plot(
+        data,
+        x_axis="SampleType",
+        y_axis="Value",
+        scaling_method=scaling_method,
+        data_type=data_type,
+    ).panelplot(plot_type)
+
+    count = Stats(data, "SampleType", alpha=alpha).get_factor_count
+
+    log_info = (
+        f"Input: {sample_types} - {data_type} - panel {variables} - {scaling_method} - {plot_type}"
+    )
+    send_slack_msg("One dimensional browser", log_info)
+    logger.info(log_info)
 
-    return dash.no_update
+    return True, fig, True, msg, "Applicable only for single variable.", count, ""
@@ -1,14 +1,26 @@
+import io
+from os.path import getmtime
+
 import dash
 import dash_bootstrap_components as dbc
+import flask
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
 from dash import Input, Output, callback, dcc, html
+from src.basics import export_sample_sheet
 from src.utils import load_config
 
 config = load_config()
 repository_summary = pd.read_pickle(config["summary_metafile"])
 
+# export format -> extension and mimetype of sample sheet export
+EXPORTS = {
+    "csv": ("csv.gz", "application/gzip"),
+    "parquet": ("parquet", "application/vnd.apache.parquet"),
+    "arrow": ("arrow", "application/vnd.apache.arrow.file"),
+}
+
 
 def plot(cnt: pd.Series, plot_type: str = None) -> go.Figure:
     """
@@ -35,6 +47,7 @@ def plot(cnt: pd.Series, plot_type: str = None) -> go.Figure:
 
 
 dash.register_page(__name__)
+app = dash.get_app()
 
 layout = dbc.Container(
     [
@@ -59,8 +72,27 @@ layout = dbc.Container(
             [
                 dbc.Col("Current sample sheet: "),
                 html.Br(),
-                dbc.Col(dbc.Button("download CSV", id="download-sample-sheet-button", className="button-interact")),
-                dcc.Download(id="download-sample-sheet-frame"),
+                dbc.Col(
+                    dcc.Dropdown(
+                        id="download-sample-sheet-format",
+                        options=[
+                            {"label": "CSV", "value": "csv"},
+                            {"label": "Parquet", "value": "parquet"},
+                            {"label": "Arrow IPC", "value": "arrow"},
+                        ],
+                        value="csv",
+                        clearable=False,
+                    )
+                ),
+                dbc.Col(
+                    dbc.Button(
+                        "download",
+                        id="download-sample-sheet-button",
+                        className="button-interact",
+                        href="/download/sample-sheet?format=csv",
+                        external_link=True,
+                    )
+                ),
             ]
         ),
         html.Hr(),
@@ -123,26 +155,43 @@ layout = dbc.Container(
 
 
 @callback(
-    Output("download-sample-sheet-frame", "data"),
-    Input("download-sample-sheet-button", "n_clicks"),
-    prevent_initial_call=True,
+    Output("download-sample-sheet-button", "href"),
+    Input("download-sample-sheet-format", "value"),
 )
-def sample_sheet_generator(n_clicks: int, sample_sheet_path: str = config["sample_sheet"]):
+def update_sample_sheet_link(file_format: str) -> str:
     """
-    Function to generate sample sheet in csv format.
+    Function to point download button to sample sheet export in selected file format.
+
+    :param file_format:
+    :return str:
+    """
+    return f"/download/sample-sheet?format={file_format or 'csv'}"
+
+
+@app.server.route("/download/sample-sheet")
+def download_sample_sheet(sample_sheet_path: str = config["sample_sheet"]) -> flask.Response:
+    """
+    Function to serve sample sheet in gzip CSV, parquet or Arrow IPC format.
+    Export is built on first request and kept as compressed bytes until sample sheet is rebuilt by the pipeline.
+    Response carries ETag and Last-Modified derived from sample sheet version, so repeated downloads are answered
+    with 304 Not Modified.
 
-    :param n_clicks:
     :param sample_sheet_path:
-    :return sample_sheet:
+    :return flask.Response:
     """
-    sample_sheet = pd.read_parquet(
-        sample_sheet_path,
-        columns=[
-            "primary_diagnosis",
-            "tissue_or_organ_of_origin",
-            "sample_type",
-            "experimental_strategy",
-        ],
+    file_format = flask.request.args.get("format", "csv")
+    if file_format not in EXPORTS:
+        flask.abort(404)
+
+    mtime = getmtime(sample_sheet_path)
+    extension, mimetype = EXPORTS[file_format]
+
+    return flask.send_file(
+        io.BytesIO(export_sample_sheet(sample_sheet_path, mtime, file_format)),
+        mimetype=mimetype,
+        as_attachment=True,
+        download_name=f"sample_sheet.{extension}",
+        conditional=True,
+        etag=f"{file_format}-{mtime}",
+        last_modified=mtime,
     )
-    sample_sheet.index.name = "Case_ID"
-    return dcc.send_data_frame(sample_sheet.to_csv, "sample_sheet.csv")
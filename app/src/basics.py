@@ -1,12 +1,132 @@
+import io
 import typing as t
-from os.path import join
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from os.path import exists, getmtime, join
 
 import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from pyarrow import feather
 
+from .cache import FrameCache
+from .encoding import decode_frame, parse_encoding
+from .metadata import feature_groups_index, metadata_service
 from .utils import load_config
 
 config = load_config()
+frame_cache = FrameCache(config["frame_cache_bytes"])
+loader_pool = ThreadPoolExecutor(max_workers=config["loader_threads"])
+
+SAMPLE_SHEET_COLUMNS = [
+    "primary_diagnosis",
+    "tissue_or_organ_of_origin",
+    "sample_type",
+    "experimental_strategy",
+]
+
+
+@lru_cache(maxsize=512)
+def load_sidecar(path: str, mtime: float) -> t.Any:
+    """
+    Function to load sidecar file exported by the pipeline next to processed frame
+    [feature index: feature -> row group, offset, or feature moments].
+    Loaded objects [with hash tables of their indexes] are kept per process, so lookups are O(1).
+    mtime is a part of the key, so a rebuilt file is reloaded.
+
+    :param path:
+    :param mtime:
+    :return Any:
+    """
+    return pd.read_pickle(path)
+
+
+@lru_cache(maxsize=512)
+def load_ipc_table(path: str, mtime: float) -> pa.Table:
+    """
+    Function to memory-map Arrow IPC [Feather v2] copy of processed frame.
+    Mapped table is not deserialized, its buffers point directly to the OS page cache shared by all workers.
+
+    :param path:
+    :param mtime:
+    :return pa.Table:
+    """
+    return pa.ipc.open_file(pa.memory_map(path, "r")).read_all()
+
+
+@lru_cache(maxsize=512)
+def load_ipc_index(path: str, mtime: float) -> pd.Index:
+    """
+    Function to build pandas index [feature IDs] of memory-mapped Arrow IPC copy of processed frame.
+    Unlike numeric columns, index of strings is not zero-copy, so it is built once per process and file.
+
+    :param path:
+    :param mtime:
+    :return pd.Index:
+    """
+    table = load_ipc_table(path, mtime)
+    index_columns = [
+        name for name in table.schema.pandas_metadata["index_columns"] if isinstance(name, str)
+    ]
+
+    return table.select(index_columns).to_pandas().index
+
+
+@lru_cache(maxsize=8)
+def load_feature_major_store(path: str, mtime: float) -> np.ndarray:
+    """
+    Function to memory-map pan-cancer, feature-major store [features x samples of all sample groups].
+    Each feature is a single contiguous row, so reading one feature across the whole repository is one read.
+
+    :param path:
+    :param mtime:
+    :return np.ndarray:
+    """
+    return np.load(path, mmap_mode="r")
+
+
+@lru_cache(maxsize=512)
+def load_encoding(path: str, mtime: float) -> t.Optional[dict]:
+    """
+    Function to read encoding record of processed frame [float32 or fixed-point uint16] from its parquet schema.
+
+    :param path:
+    :param mtime:
+    :return Optional[dict]:
+    """
+    return parse_encoding(pq.read_schema(path).metadata)
+
+
+@lru_cache(maxsize=8)
+def export_sample_sheet(path: str, mtime: float, file_format: str) -> bytes:
+    """
+    Function to export public columns of sample sheet as compressed bytes [gzip CSV, zstd parquet or Arrow IPC].
+    Export is built once per process and file version, mtime is a part of the key, so a rebuilt sample sheet
+    is exported again.
+
+    :param path:
+    :param mtime:
+    :param file_format: csv, parquet or arrow
+    :return bytes:
+    """
+    sample_sheet = pd.read_parquet(path, columns=SAMPLE_SHEET_COLUMNS)
+    sample_sheet.index.name = "Case_ID"
+
+    if file_format == "parquet":
+        return sample_sheet.to_parquet(compression="zstd")
+
+    if file_format == "arrow":
+        sink = pa.BufferOutputStream()
+        feather.write_feather(pa.Table.from_pandas(sample_sheet), sink, compression="zstd")
+        return sink.getvalue().to_pybytes()
+
+    if file_format == "csv":
+        buffer = io.BytesIO()
+        sample_sheet.to_csv(buffer, compression="gzip")
+        return buffer.getvalue()
+
+    raise ValueError(f"Unknown file format: {file_format}.")
 
 
 class FrameOperations:
@@ -15,6 +135,251 @@ class FrameOperations:
         self.sample_types = sample_types
         self.basic_path = config["base_path"]
 
+    @property
+    def platform(self) -> str:
+        """
+        Name of the platform [file stem] corresponding to requested data type.
+
+        :return str:
+        """
+        if self.data_type == "Expression [RNA-seq]":
+            return "RNA-Seq"
+        return "Methylation Array"
+
+    def _read_rows(
+        self,
+        sample_type: str,
+        variables: t.Collection[str],
+        platform: t.Optional[str] = None,
+        columns: t.Optional[t.List[str]] = None,
+    ) -> pd.DataFrame:
+        """
+        Method to read only selected rows [genes or CpGs] and, optionally, selected columns [samples] from a single
+        dataset. Both selections are pushed down to the reader.
+        If sidecar feature index and memory-mapped Arrow IPC copy are available, requested rows are taken directly.
+        If only sidecar index is available, only row groups holding requested variables are decoded.
+        Otherwise, predicate is pushed down to the parquet reader, so row groups whose min/max statistics exclude all
+        requested variables are skipped. Variables absent in dataset are ignored. Values are decoded to float64.
+
+        :param sample_type:
+        :param variables:
+        :param platform: defaults to platform of requested data type
+        :param columns: defaults to all samples
+        :return pd.DataFrame:
+        """
+        platform = platform or self.platform
+        path = join(self.basic_path, sample_type, f"{platform}.parquet")
+        index_path = join(self.basic_path, sample_type, f"{platform}.index.pkl")
+
+        if not exists(index_path):
+            cached_frame = frame_cache.get(
+                (sample_type, platform, getmtime(path)), count_miss=False
+            )
+            if cached_frame is not None:
+                rows = cached_frame.index.intersection(list(variables))
+                frame = cached_frame.loc[rows, columns if columns is not None else slice(None)]
+                return decode_frame(frame, self.__encoding(sample_type, platform))
+
+            index_column = pq.read_schema(path).pandas_metadata["index_columns"][0]
+            frame = pd.read_parquet(
+                path, columns=columns, filters=[(index_column, "in", list(variables))]
+            )
+            return decode_frame(frame, self.__encoding(sample_type, platform))
+
+        index = load_sidecar(index_path, getmtime(index_path))
+        positions = index.index.get_indexer(list(dict.fromkeys(variables)))
+
+        return self.__take(sample_type, platform, index.iloc[positions[positions >= 0]], columns)
+
+    def __take(
+        self,
+        sample_type: str,
+        platform: str,
+        rows: pd.DataFrame,
+        columns: t.Optional[t.List[str]] = None,
+    ) -> pd.DataFrame:
+        """
+        Method to read rows located by sidecar feature index from a single dataset.
+        Rows are taken from memory-mapped Arrow IPC copy or cached frame if available, otherwise only row groups
+        holding requested rows are decoded, through process-wide frame cache. Rows are returned in requested order.
+
+        :param sample_type:
+        :param platform:
+        :param rows: records of sidecar feature index
+        :param columns: defaults to all samples
+        :return pd.DataFrame:
+        """
+        ipc_path = join(self.basic_path, sample_type, f"{platform}.arrow")
+        if exists(ipc_path):
+            table = load_ipc_table(ipc_path, getmtime(ipc_path))
+            if columns is not None:
+                table = table.select([*columns, *table.schema.pandas_metadata["index_columns"]])
+
+            frame = table.take(rows["row"].values).to_pandas()
+            return decode_frame(frame, self.__encoding(sample_type, platform))
+
+        path = join(self.basic_path, sample_type, f"{platform}.parquet")
+        mtime = getmtime(path)
+        cached_frame = frame_cache.get((sample_type, platform, mtime), count_miss=False)
+        if cached_frame is not None:
+            frame = cached_frame.iloc[rows["row"].values]
+            frame = frame if columns is None else frame[columns]
+            return decode_frame(frame, self.__encoding(sample_type, platform))
+
+        parquet_file = pq.ParquetFile(path)
+        if rows.empty:
+            frame = parquet_file.schema_arrow.empty_table().to_pandas()[columns or slice(None)]
+            return decode_frame(frame, self.__encoding(sample_type, platform))
+
+        blocks = []
+        for row_group, group in rows.groupby("row_group"):
+            key = (sample_type, platform, mtime, int(row_group))
+            block = frame_cache.get(key)
+            if block is None:
+                block = parquet_file.read_row_group(row_group, use_pandas_metadata=True).to_pandas()
+                frame_cache.put(key, block)
+            blocks.append(block.iloc[group["offset"].values])
+
+        # restore requested order of rows, grouping by row group is stable
+        order = np.argsort(rows["row_group"].values, kind="stable")
+        frame = pd.concat(blocks).iloc[np.argsort(order)]
+        frame = frame if columns is None else frame[columns]
+        return decode_frame(frame, self.__encoding(sample_type, platform))
+
+    def __encoding(self, sample_type: str, platform: str) -> t.Optional[dict]:
+        """
+        Method returns encoding record of single dataset, None if dataset is stored without encoding.
+
+        :param sample_type:
+        :param platform:
+        :return Optional[dict]:
+        """
+        path = join(self.basic_path, sample_type, f"{platform}.parquet")
+        return load_encoding(path, getmtime(path))
+
+    def _canonical_axis(self) -> t.Optional[pd.Index]:
+        """
+        Method returns canonical, sorted feature axis shared by all datasets of the platform,
+        or None if it is not available.
+
+        :return Optional[pd.Index]:
+        """
+        path = join(self.basic_path, f"{self.platform}.axis.pkl")
+        if not exists(path):
+            return None
+
+        return load_sidecar(path, getmtime(path))
+
+    def _read_positions(
+        self, sample_type: str, positions: np.ndarray
+    ) -> t.Tuple[np.ndarray, t.List[str], int]:
+        """
+        Method to read features located by their positions on canonical feature axis from a single dataset.
+        Features absent in dataset are explicitly padded with NaNs.
+
+        :param sample_type:
+        :param positions:
+        :return np.ndarray, List[str], int: values [positions x samples], samples, number of found features
+        """
+        index_path = join(self.basic_path, sample_type, f"{self.platform}.index.pkl")
+        index = load_sidecar(index_path, getmtime(index_path))
+        group_positions = index["position"].values
+
+        rows = np.searchsorted(group_positions, positions)
+        found = rows < group_positions.size
+        found[found] = group_positions[rows[found]] == positions[found]
+
+        frame = self.__take(sample_type, self.platform, index.iloc[rows[found]])
+        values = np.full((positions.size, frame.shape[1]), np.nan)
+        values[found] = frame.to_numpy(dtype=np.float64)
+
+        return values, list(frame.columns), int(found.sum())
+
+    def _stack(self, positions: np.ndarray) -> t.Tuple[pd.DataFrame, pd.Series, t.Dict[str, int]]:
+        """
+        Method to assemble features located by positions on canonical feature axis from all sources
+        [sample types, read concurrently]. Sources are stacked positionally, without label alignment.
+
+        :param positions:
+        :return pd.DataFrame, pd.Series, Dict[str, int]: frame, sample types, number of found features per source
+        """
+        blocks = list(
+            loader_pool.map(
+                lambda sample_type: self._read_positions(sample_type, positions),
+                self.sample_types,
+            )
+        )
+
+        columns = [column for _, samples, _ in blocks for column in samples]
+        frame = pd.DataFrame(
+            np.hstack([values for values, _, _ in blocks]),
+            index=self._canonical_axis()[positions],
+            columns=columns,
+        )
+        sample_frame = pd.Series(
+            np.repeat(list(self.sample_types), [len(samples) for _, samples, _ in blocks]),
+            index=columns,
+            name="SampleType",
+        )
+        found = {
+            sample_type: n_found for sample_type, (_, _, n_found) in zip(self.sample_types, blocks)
+        }
+
+        return frame, sample_frame, found
+
+    def _read_frame(self, sample_type: str) -> pd.DataFrame:
+        """
+        Method to read whole dataset. Memory-mapped Arrow IPC copy is used if available [no per-process copy of
+        the data, index is built once per process], otherwise parquet file is decoded through process-wide frame
+        cache.
+        Frames are kept in their stored encoding [float32, uint16] and decoded to float64 on return.
+        Returned frame may be shared between requests and must not be modified in place.
+
+        :param sample_type:
+        :return pd.DataFrame:
+        """
+        ipc_path = join(self.basic_path, sample_type, f"{self.platform}.arrow")
+        if exists(ipc_path):
+            mtime = getmtime(ipc_path)
+            table = load_ipc_table(ipc_path, mtime)
+            index = load_ipc_index(ipc_path, mtime)
+
+            index_columns = table.schema.pandas_metadata["index_columns"]
+            frame = table.select(
+                [name for name in table.column_names if name not in index_columns]
+            ).to_pandas(split_blocks=True)
+            frame.index = index
+            return decode_frame(frame, self.__encoding(sample_type, self.platform))
+
+        path = join(self.basic_path, sample_type, f"{self.platform}.parquet")
+        key = (sample_type, self.platform, getmtime(path))
+
+        frame = frame_cache.get(key)
+        if frame is None:
+            frame = pd.read_parquet(path)
+            frame_cache.put(key, frame)
+
+        return decode_frame(frame, self.__encoding(sample_type, self.platform))
+
+    def storage_stats(self) -> pd.DataFrame:
+        """
+        Method returns storage encoding, achieved compression ratio and read throughput [MB/s] of requested sources,
+        as measured by the pipeline. If storage report is not available method returns empty frame.
+
+        :return pd.DataFrame:
+        """
+        path = join(self.basic_path, "storage_report.pkl")
+        if not exists(path):
+            return pd.DataFrame()
+
+        report = load_sidecar(path, getmtime(path))
+        sample_types = (
+            [self.sample_types] if isinstance(self.sample_types, str) else self.sample_types
+        )
+        keys = [(sample_type, self.platform) for sample_type in sample_types]
+
+        return report.loc[[key for key in keys if key in report.index]]
+
     def load_whole_dataset(self) -> pd.DataFrame:
         """
         Method to load whole, single dataset.
@@ -25,18 +390,65 @@ class FrameOperations:
         if not isinstance(self.sample_types, str):
             raise Exception("Applicable only to single sample type.")
 
-        if self.data_type == "Expression [RNA-seq]":
-            frame = pd.read_parquet(join(self.basic_path, self.sample_types, "RNA-Seq.parquet"))
+        return self._read_frame(self.sample_types)
+
+    def iter_csv(self) -> t.Iterator[str]:
+        """
+        Method to export whole, single dataset as CSV chunks, one chunk per parquet row group.
+        Only one decoded row group is kept in memory at a time, independently of dataset size.
+
+        :return Iterator[str]:
+        """
+        if not isinstance(self.sample_types, str):
+            raise Exception("Applicable only to single sample type.")
+
+        path = join(self.basic_path, self.sample_types, f"{self.platform}.parquet")
+        parquet_file = pq.ParquetFile(path)
+        encoding = self.__encoding(self.sample_types, self.platform)
+
+        for row_group in range(parquet_file.num_row_groups):
+            frame = parquet_file.read_row_group(row_group, use_pandas_metadata=True).to_pandas()
+            yield decode_frame(frame, encoding).to_csv(header=row_group == 0)
+
+    def stored_file(self, extension: str) -> t.Optional[str]:
+        """
+        Method returns path of stored single dataset file [parquet or Arrow IPC copy] if it can be served as is,
+        i.e. it exists and its values are stored without encoding. Otherwise method returns None.
+
+        :param extension: parquet or arrow
+        :return Optional[str]:
+        """
+        if not isinstance(self.sample_types, str):
+            raise Exception("Applicable only to single sample type.")
+
+        path = join(self.basic_path, self.sample_types, f"{self.platform}.{extension}")
+        encoding = self.__encoding(self.sample_types, self.platform)
+
+        if exists(path) and (encoding is None or encoding["encoding"] == "float64"):
+            return path
+
+        return None
+
+    def export_bytes(self, file_format: str) -> bytes:
+        """
+        Method exports whole, single dataset with decoded values as parquet or Arrow IPC file.
+
+        :param file_format: parquet or arrow
+        :return bytes:
+        """
+        table = pa.Table.from_pandas(self.load_whole_dataset(), preserve_index=True)
+        sink = pa.BufferOutputStream()
+
+        if file_format == "parquet":
+            pq.write_table(table, sink)
         else:
-            frame = pd.read_parquet(
-                join(self.basic_path, self.sample_types, "Methylation Array.parquet")
-            )
+            feather.write_feather(table, sink, compression="zstd")
 
-        return frame
+        return sink.getvalue().to_pybytes()
 
     def load_1d(self, variable: str) -> t.Tuple[pd.DataFrame, str]:
         """
-        Method loads frame of measurement, for one or many sample types.
+        Method loads frame of measurement, for one or many sample types [read concurrently].
         If variable is not in repository method returns empty frame.
         Additionally, the method returns a message describing the process.
 
@@ -44,10 +456,8 @@ class FrameOperations:
         :return pd.DataFrame, str:
         """
 
-        frame = []
-
         for sample_type in self.sample_types:
-            metadata = pd.read_pickle(join(self.basic_path, sample_type, "metadata.pkl"))
+            metadata = metadata_service.get(sample_type)
 
             if self.data_type == "Expression [RNA-seq]":
                 if variable not in metadata["genes"]:
@@ -56,10 +466,6 @@ class FrameOperations:
                         f"Gene: '{variable}' not found in '{sample_type}' repository",
                     )
 
-                temporary_frame = pd.read_parquet(
-                    join(self.basic_path, sample_type, "RNA-Seq.parquet")
-                )
-
             else:  # self.data_type == "Methylation [450K/EPIC]"
                 if variable not in metadata["probes"]:
                     return (
@@ -67,14 +473,13 @@ class FrameOperations:
                         f"CpG: '{variable}' not found in '{sample_type}' repository",
                     )
 
-                temporary_frame = pd.read_parquet(
-                    join(self.basic_path, sample_type, "Methylation Array.parquet")
-                )
-
+        def read(sample_type: str) -> pd.DataFrame:
+            temporary_frame = self._read_rows(sample_type, [variable])
             temporary_frame = temporary_frame.loc[variable, :].to_frame()
             temporary_frame["SampleType"] = sample_type
-            frame.append(temporary_frame)
+            return temporary_frame
 
+        frame = list(loader_pool.map(read, self.sample_types))
         frame = pd.concat(frame, axis=0)
         frame = frame.dropna(axis=0)  # drop rows (samples) with NaNs
 
@@ -83,32 +488,89 @@ class FrameOperations:
 
         return frame, "Status: done"
 
+    def load_all_groups_1d(self, variable: str) -> t.Tuple[pd.DataFrame, str]:
+        """
+        Method loads frame of measurement for all sample groups in repository, from feature-major store.
+        Sample groups without the variable are skipped. If variable is not in repository or store is not available
+        method returns empty frame. Additionally, the method returns a message describing the process.
+
+        :param variable:
+        :return pd.DataFrame, str:
+        """
+        path = join(self.basic_path, f"{self.platform}.feature_major.npy")
+        samples_path = join(self.basic_path, f"{self.platform}.feature_major.samples.pkl")
+        axis = self._canonical_axis()
+
+        if axis is None or not exists(path) or not exists(samples_path):
+            return pd.DataFrame(), "All sample groups mode is not available for this repository."
+
+        feature = "Gene" if self.data_type == "Expression [RNA-seq]" else "CpG"
+        position = axis.get_indexer([variable])[0]
+        if position < 0:
+            return pd.DataFrame(), f"{feature}: '{variable}' not found in repository"
+
+        store = load_feature_major_store(path, getmtime(path))
+        sample_map = load_sidecar(samples_path, getmtime(samples_path))
+
+        frame = pd.DataFrame(
+            {
+                variable: np.asarray(store[position], dtype=np.float64),
+                "SampleType": sample_map.values,
+            },
+            index=sample_map.index,
+        )
+        frame = frame.dropna(axis=0)  # drop rows (samples) with NaNs
+
+        if frame.empty:
+            return frame, "Data records for this specific requests are not available."
+
+        return frame, "Status: done"
+
     def load_many(self, variables: t.List[str]) -> t.Tuple[pd.DataFrame, str]:
         """
-        Method to load data from many sources [sample types] and extract specific set of variables.
+        Method to load data from many sources [sample types, read concurrently] and extract specific set of variables.
         If set of variables [CpGs or genes] is not present in certain sample type method returns empty frame with
-        appropriate message.
+        appropriate message. Global feature index is used to skip absent variables before any dataset is opened.
 
         :param variables:
         :return pd.DataFrame, str:
         """
         frame = []
-        variables = set(variables)
+        variables = list(dict.fromkeys(variables))
+
+        present = feature_groups_index.present_in(self.platform, variables, self.sample_types)
+        if present is None:
+            present = {sample_type: variables for sample_type in self.sample_types}
 
         for sample_type in self.sample_types:
-            if self.data_type == "Expression [RNA-seq]":
-                temporary_frame = pd.read_parquet(
-                    join(self.basic_path, sample_type, "RNA-Seq.parquet")
-                )
-            else:  # self.data_type == "Methylation [450K/EPIC]"
-                temporary_frame = pd.read_parquet(
-                    join(self.basic_path, sample_type, "Methylation Array.parquet")
+            if not present[sample_type]:
+                return (
+                    pd.DataFrame(),
+                    f"Selected set of variables is not available in {sample_type} dataset.",
                 )
 
-            temporary_frame = temporary_frame.loc[
-                list(variables.intersection(set(temporary_frame.index)))
-            ].T
+        axis = self._canonical_axis()
+        if axis is not None:
+            positions = axis.get_indexer(variables)
+            frame, sample_frame, found = self._stack(positions[positions >= 0])
+
+            for sample_type in self.sample_types:
+                if not found[sample_type]:
+                    return (
+                        pd.DataFrame(),
+                        f"Selected set of variables is not available in {sample_type} dataset.",
+                    )
+
+            frame = frame.T
+            frame["SampleType"] = sample_frame.values
+            return frame.dropna(axis=1), ""  # drop columns (variables) with NaNs
 
+        frames = loader_pool.map(
+            lambda sample_type: self._read_rows(sample_type, present[sample_type]).T,
+            self.sample_types,
+        )
+
+        for sample_type, temporary_frame in zip(self.sample_types, frames):
             if temporary_frame.empty:
                 return (
                     pd.DataFrame(),
@@ -121,25 +583,97 @@ class FrameOperations:
         frame = pd.concat(frame, axis=0).dropna(axis=1)  # drop columns (variables) with NaNs
         return frame, ""
 
+    def load_panel(self, variables: t.List[str]) -> t.Tuple[pd.DataFrame, t.Dict[str, t.List[str]]]:
+        """
+        Method to load panel of variables from many sources [sample types, read concurrently], reading all requested
+        variables in one pass per source. Unlike load_many, variables absent in some sources are kept [with NaNs for
+        samples of those sources] and reported.
+
+        :param variables:
+        :return pd.DataFrame, Dict[str, List[str]]: frame [samples x variables + SampleType],
+        variable -> sample types not containing it
+        """
+        variables = list(dict.fromkeys(variables))
+        present = feature_groups_index.present_in(self.platform, variables, self.sample_types)
+
+        if present is None:
+            key = "genes" if self.data_type == "Expression [RNA-seq]" else "probes"
+            present = {
+                sample_type: [
+                    variable
+                    for variable in variables
+                    if variable in metadata_service.get(sample_type)[key]
+                ]
+                for sample_type in self.sample_types
+            }
+
+        not_found = {
+            variable: [
+                sample_type
+                for sample_type in self.sample_types
+                if variable not in present[sample_type]
+            ]
+            for variable in variables
+        }
+        not_found = {variable: groups for variable, groups in not_found.items() if groups}
+        found = [
+            variable
+            for variable in variables
+            if len(not_found.get(variable, [])) < len(self.sample_types)
+        ]
+
+        if not found:
+            return pd.DataFrame(), not_found
+
+        axis = self._canonical_axis()
+        if axis is not None:
+            positions = axis.get_indexer(found)
+            frame, sample_frame, _ = self._stack(positions[positions >= 0])
+            frame = frame.T
+            frame["SampleType"] = sample_frame.values
+
+        else:
+            sample_types = [
+                sample_type for sample_type in self.sample_types if present[sample_type]
+            ]
+            frames = loader_pool.map(
+                lambda sample_type: self._read_rows(sample_type, present[sample_type]).T,
+                sample_types,
+            )
+
+            frame = []
+            for sample_type, temporary_frame in zip(sample_types, frames):
+                temporary_frame["SampleType"] = sample_type
+                frame.append(temporary_frame)
+
+            frame = pd.concat(frame, axis=0)
+
+        frame = frame.dropna(axis=0, how="all", subset=found)  # drop samples without any variable
+        return frame[[*found, "SampleType"]], not_found
+
     def load_mvf(self, threshold: float = 0.9) -> t.Tuple[pd.DataFrame, pd.Series]:
         """
-        Method to load most variable features [mvf] across multiple sources [sample types].
+        Method to load most variable features [mvf] across multiple sources [sample types, read concurrently].
+        If canonical feature axis and feature moments are available for all sources, the pooled standard deviation
+        is computed from moments and only the selected features are read and stacked positionally.
+        Features with missing values in any source are dropped.
 
         :param threshold:
         :return:
         """
+        moments = self.__load_moments()
+        if moments is not None and self._canonical_axis() is not None:
+            positions, std = self.__pooled_std(moments)
+            selected = positions[std >= np.quantile(std, threshold)]
+
+            frame, sample_frame, _ = self._stack(selected)
+            return frame.dropna(axis=0), sample_frame
+
         frame = []
         sample_frame = []
-        for sample_type in self.sample_types:
-            if self.data_type == "Expression [RNA-seq]":
-                temporary_frame = pd.read_parquet(
-                    join(self.basic_path, sample_type, "RNA-Seq.parquet")
-                )
-            else:
-                temporary_frame = pd.read_parquet(
-                    join(self.basic_path, sample_type, "Methylation Array.parquet")
-                )
+        frames = loader_pool.map(self._read_frame, self.sample_types)
 
+        for sample_type, temporary_frame in zip(self.sample_types, frames):
             if not temporary_frame.empty:
                 frame.append(temporary_frame)
                 samples = pd.Series(
@@ -156,6 +690,49 @@ class FrameOperations:
         frame = frame.loc[std >= std.quantile(threshold)]
         return frame, sample_frame
 
+    def __load_moments(self) -> t.Optional[t.List[dict]]:
+        """
+        Method to load feature moments [n, sum, sum of squares] of requested sources.
+        Returns None if moments are not available for any of sources.
+
+        :return Optional[List[dict]]:
+        """
+        moments = []
+        for sample_type in self.sample_types:
+            path = join(self.basic_path, sample_type, f"{self.platform}.moments.pkl")
+            if not exists(path):
+                return None
+
+            moments.append(load_sidecar(path, getmtime(path)))
+
+        return moments
+
+    def __pooled_std(self, moments: t.List[dict]) -> t.Tuple[np.ndarray, np.ndarray]:
+        """
+        Method to compute standard deviation [ddof=1] of features over all samples of combined sources.
+        Moments are accumulated positionally on canonical feature axis. Only features without missing values
+        in all sources are considered.
+
+        :param moments:
+        :return np.ndarray, np.ndarray: positions of features on canonical axis, standard deviations
+        """
+        size = self._canonical_axis().size
+        pooled = np.zeros((size, 3))
+        complete = np.zeros(size, dtype=int)
+
+        for sample_type, record in zip(self.sample_types, moments):
+            index_path = join(self.basic_path, sample_type, f"{self.platform}.index.pkl")
+            positions = load_sidecar(index_path, getmtime(index_path))["position"].values
+
+            pooled[positions] += record["moments"][["n", "sum", "sum_of_squares"]].to_numpy()
+            complete[positions] += record["moments"]["n"].values == record["samples"]
+
+        positions = np.flatnonzero(complete == len(moments))
+        n, total, total_of_squares = pooled[positions].T
+        variance = (total_of_squares - total**2 / n) / (n - 1)
+
+        return positions, np.sqrt(np.clip(variance, 0, None))
+
     def load_met_exp_frame(self, gene: str, probe: str) -> t.Tuple[pd.DataFrame, str]:
         """
         Method to load frame with expression AND methylation data for requested sample type.
@@ -166,7 +743,7 @@ class FrameOperations:
         :param probe:
         :return:
         """
-        meta = pd.read_pickle(join(self.basic_path, self.sample_types, "metadata.pkl"))
+        meta = metadata_service.get(self.sample_types)
 
         if not meta["commonBetween"]:
             return pd.DataFrame(), "No common samples for this sample type."
@@ -177,13 +754,13 @@ class FrameOperations:
         if probe not in meta["probes"]:
             return pd.DataFrame(), f"Probe: '{probe}' not found in requested repository."
 
-        exp_frame = pd.read_parquet(join(self.basic_path, self.sample_types, "RNA-Seq.parquet"))
-        exp_frame = exp_frame.loc[gene, list(meta["commonBetween"])]
+        common = list(meta["commonBetween"])
 
-        met_frame = pd.read_parquet(
-            join(self.basic_path, self.sample_types, "Methylation Array.parquet")
-        )
-        met_frame = met_frame.loc[probe, list(meta["commonBetween"])]
+        exp_frame = self._read_rows(self.sample_types, [gene], "RNA-Seq", common)
+        exp_frame = exp_frame.loc[gene, common]
+
+        met_frame = self._read_rows(self.sample_types, [probe], "Methylation Array", common)
+        met_frame = met_frame.loc[probe, common]
 
         frame = pd.concat((exp_frame, met_frame), axis=1)
         frame = frame.dropna(axis=0)
@@ -0,0 +1,101 @@
+import threading
+import typing as t
+from collections import OrderedDict
+
+import pandas as pd
+
+# (sample group, platform, file mtime) for whole frames, (..., row group) for single row groups
+CacheKey = t.Tuple[t.Any, ...]
+
+
+class FrameCache:
+    def __init__(self, max_bytes: int):
+        """
+        Process-wide LRU cache of decoded frames keyed by (sample group, platform, file mtime), decoded row groups
+        are keyed by (sample group, platform, file mtime, row group).
+        Eviction is driven by memory budget [bytes] instead of number of entries.
+        Cached frames are shared between requests and must not be modified in place.
+
+        :param max_bytes:
+        """
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._frames: t.OrderedDict[CacheKey, t.Tuple[pd.DataFrame, int]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: CacheKey, count_miss: bool = True) -> t.Optional[pd.DataFrame]:
+        """
+        Method to get frame from cache, returns None if frame is not cached.
+        Opportunistic lookups [frame is not put into cache on miss] should not be counted as misses.
+
+        :param key:
+        :param count_miss:
+        :return Optional[pd.DataFrame]:
+        """
+        with self._lock:
+            if key not in self._frames:
+                self.misses += count_miss
+                return None
+
+            self._frames.move_to_end(key)
+            self.hits += 1
+            return self._frames[key][0]
+
+    def put(self, key: CacheKey, frame: pd.DataFrame) -> None:
+        """
+        Method to put frame into cache. Older versions [mtime] of the same file are dropped.
+        Frames exceeding whole memory budget are not cached.
+
+        :param key:
+        :param frame:
+        :return None:
+        """
+        size = int(frame.memory_usage(index=True, deep=True).sum())
+
+        with self._lock:
+            for stale_key in [k for k in self._frames if k[:2] == key[:2] and k[2] != key[2]]:
+                self.__remove(stale_key)
+
+            if size > self.max_bytes:
+                return
+
+            while self.current_bytes + size > self.max_bytes:
+                self.__remove(next(iter(self._frames)))
+                self.evictions += 1
+
+            self._frames[key] = (frame, size)
+            self.current_bytes += size
+
+    def __remove(self, key: CacheKey) -> None:
+        _, size = self._frames.pop(key)
+        self.current_bytes -= size
+
+    def clear(self) -> None:
+        """
+        Method to drop all cached frames.
+
+        :return None:
+        """
+        with self._lock:
+            self._frames.clear()
+            self.current_bytes = 0
+
+    @property
+    def stats(self) -> dict:
+        """
+        Method returns cache counters.
+
+        :return dict:
+        """
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self._frames),
+                "bytes": self.current_bytes,
+                "max_bytes": self.max_bytes,
+            }
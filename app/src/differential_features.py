@@ -1,9 +1,324 @@
+import typing as t
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from os.path import exists
+
 import numpy as np
 import pandas as pd
-import pingouin as pg
 import scipy.stats as sts
 from statsmodels.stats.multitest import fdrcorrection
 
+from .normality import shapiro_wilk
+from .utils import write_parquet
+
+# threshold independent p-values kept in records, test is selected in apply_thresholds
+TEST_COLUMNS = [
+    "p-value(normality A)",
+    "p-value(normality B)",
+    "p-value(equal variance)",
+    "p-value(parametric)",
+    "p-value(parametric - not equal variance)",
+    "p-value(non-parametric)",
+]
+
+
+def summarize_group(values: np.ndarray) -> pd.DataFrame:
+    """
+    Function to compute statistics of a single group of samples, row by row of [features x samples] matrix,
+    which do not depend on the compared group: mean, variance, normality [Shapiro-Wilk] p-value and moments
+    of absolute deviations from median [Levene]. Summary of a group can be reused by all of its comparisons.
+
+    :param values: values of group [features x samples]
+    :return pd.DataFrame: summary per feature
+    """
+    deviations = np.abs(values - np.median(values, axis=1, keepdims=True))
+    deviations_mean = deviations.mean(axis=1)
+
+    return pd.DataFrame(
+        {
+            "mean": values.mean(axis=1),
+            "var": values.var(axis=1, ddof=1),
+            "normality": shapiro_wilk(values)[1],
+            "deviations_mean": deviations_mean,
+            "deviations_ss": ((deviations - deviations_mean[:, None]) ** 2).sum(axis=1),
+        }
+    )
+
+
+def levene_pvalues(
+    summary_a: pd.DataFrame, n_a: int, summary_b: pd.DataFrame, n_b: int
+) -> np.ndarray:
+    """
+    Function to test equality of variances [Levene, median-centered, as scipy.stats.levene] of two groups,
+    row by row, from summaries of groups.
+
+    :param summary_a: summary of group A [output of summarize_group]
+    :param n_a: size of group A
+    :param summary_b: summary of group B [output of summarize_group]
+    :param n_b: size of group B
+    :return np.ndarray:
+    """
+    z_a_mean, z_b_mean = summary_a["deviations_mean"].values, summary_b["deviations_mean"].values
+    z_mean = (n_a * z_a_mean + n_b * z_b_mean) / (n_a + n_b)
+
+    numer = (n_a + n_b - 2) * (n_a * (z_a_mean - z_mean) ** 2 + n_b * (z_b_mean - z_mean) ** 2)
+    denom = summary_a["deviations_ss"].values + summary_b["deviations_ss"].values
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        statistic = numer / denom
+
+    return sts.f.sf(statistic, 1, n_a + n_b - 2)
+
+
+def mannwhitneyu_pvalues(group_a: np.ndarray, group_b: np.ndarray) -> np.ndarray:
+    """
+    Function to perform two-sided Mann-Whitney U test of two groups, row by row of [features x samples] matrices.
+    Method is chosen for each row as in scipy.stats.mannwhitneyu [method='auto']: exact if one of the groups
+    has at most 8 samples and the row has no ties, asymptotic otherwise.
+
+    :param group_a:
+    :param group_b:
+    :return np.ndarray:
+    """
+    pvalues = np.empty(group_a.shape[0])
+
+    if group_a.shape[1] > 8 and group_b.shape[1] > 8:
+        exact = np.zeros(group_a.shape[0], dtype=bool)
+    else:
+        values = np.sort(np.hstack([group_a, group_b]), axis=1)
+        exact = ~(np.diff(values, axis=1) == 0).any(axis=1)
+
+    for method, rows in (("exact", exact), ("asymptotic", ~exact)):
+        if rows.any():
+            _, pvalues[rows] = sts.mannwhitneyu(group_a[rows], group_b[rows], axis=1, method=method)
+
+    return pvalues
+
+
+def hedges_g(summary_a: pd.DataFrame, n_a: int, summary_b: pd.DataFrame, n_b: int) -> np.ndarray:
+    """
+    Function to compute Hedges` g [as pingouin.compute_effsize] of two groups, row by row, from summaries
+    of groups.
+
+    :param summary_a: summary of group A [output of summarize_group]
+    :param n_a: size of group A
+    :param summary_b: summary of group B [output of summarize_group]
+    :param n_b: size of group B
+    :return np.ndarray:
+    """
+    pooled_sd = np.sqrt(
+        ((n_a - 1) * summary_a["var"].values + (n_b - 1) * summary_b["var"].values)
+        / (n_a + n_b - 2)
+    )
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        cohen_d = (summary_a["mean"].values - summary_b["mean"].values) / pooled_sd
+
+    return cohen_d * (1 - (3 / (4 * (n_a + n_b) - 9)))
+
+
+def compare_groups(
+    features: pd.Index,
+    group_a: np.ndarray,
+    group_b: np.ndarray,
+    group_A: str,
+    group_B: str,
+) -> pd.DataFrame:
+    """
+    Function to test differences between two groups of samples for all features at once, tests are computed along
+    rows of [features x samples] matrices. Records do not depend on thresholds: p-values of normality [Shapiro-Wilk]
+    and equality of variances [Levene] tests, and of all candidate tests [Student t-test, Welch t-test,
+    Mann-Whitney U test] are kept, test is selected for each feature in apply_thresholds.
+    Defined at module level, so it can be executed in worker processes.
+
+    :param features:
+    :param group_a: values of group A [features x samples]
+    :param group_b: values of group B [features x samples]
+    :param group_A: name of group A
+    :param group_B: name of group B
+    :return pd.DataFrame: record per feature
+    """
+    return compare_summaries(
+        features,
+        group_a,
+        group_b,
+        summarize_group(group_a),
+        summarize_group(group_b),
+        group_A,
+        group_B,
+    )
+
+
+def compare_summaries(
+    features: pd.Index,
+    group_a: np.ndarray,
+    group_b: np.ndarray,
+    summary_a: pd.DataFrame,
+    summary_b: pd.DataFrame,
+    group_A: str,
+    group_B: str,
+) -> pd.DataFrame:
+    """
+    Function to test differences between two groups of samples as compare_groups, with summaries of groups
+    [output of summarize_group] computed in advance. Used by the data processing pipeline to precompute results,
+    so precomputed and live results come from the same engine.
+
+    :param features:
+    :param group_a: values of group A [features x samples]
+    :param group_b: values of group B [features x samples]
+    :param summary_a: summary of group A, row per feature
+    :param summary_b: summary of group B, row per feature
+    :param group_A: name of group A
+    :param group_B: name of group B
+    :return pd.DataFrame: record per feature
+    """
+    n_a, n_b = group_a.shape[1], group_b.shape[1]
+    _, student = sts.ttest_ind(group_a, group_b, axis=1, equal_var=True)
+    _, welch = sts.ttest_ind(group_a, group_b, axis=1, equal_var=False)
+
+    group_a_mean = summary_a["mean"].values
+    group_b_mean = summary_b["mean"].values
+    delta = group_a_mean - group_b_mean
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        fc = np.where(group_b_mean != 0, group_a_mean / group_b_mean, np.nan)
+        log_fc = np.log2(fc)
+
+    return pd.DataFrame(
+        {
+            "Feature": features,
+            f"Mean({group_A})": group_a_mean,
+            f"Mean({group_B})": group_b_mean,
+            "FC": fc,
+            "log2(FC)": log_fc,
+            "delta": delta,
+            "|delta|": np.abs(delta),
+            "Hedge`s g": hedges_g(summary_a, n_a, summary_b, n_b),
+            "p-value(normality A)": summary_a["normality"].values,
+            "p-value(normality B)": summary_b["normality"].values,
+            "p-value(equal variance)": levene_pvalues(summary_a, n_a, summary_b, n_b),
+            "p-value(parametric)": student,
+            "p-value(parametric - not equal variance)": welch,
+            "p-value(non-parametric)": mannwhitneyu_pvalues(group_a, group_b),
+        }
+    )
+
+
+def swap_groups(records: pd.DataFrame, group_A: str, group_B: str) -> pd.DataFrame:
+    """
+    Function to derive records of B vs A comparison from records of A vs B comparison [output of compare_groups],
+    without access to data. P-values of all tests and |delta| are symmetric, normality p-values and means are
+    swapped, FC and log2(FC) are computed from swapped means, delta and Hedges` g are negated.
+
+    :param records: records of group_A vs group_B comparison
+    :param group_A:
+    :param group_B:
+    :return pd.DataFrame: records of group_B vs group_A comparison
+    """
+    mean_a = records[f"Mean({group_A})"].to_numpy()
+    mean_b = records[f"Mean({group_B})"].to_numpy()
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        fc = np.where(mean_a != 0, mean_b / mean_a, np.nan)
+        log_fc = np.log2(fc)
+
+    return pd.DataFrame(
+        {
+            "Feature": records["Feature"],
+            f"Mean({group_B})": mean_b,
+            f"Mean({group_A})": mean_a,
+            "FC": fc,
+            "log2(FC)": log_fc,
+            "delta": -records["delta"],
+            "|delta|": records["|delta|"],
+            "Hedge`s g": -records["Hedge`s g"],
+            "p-value(normality A)": records["p-value(normality B)"],
+            "p-value(normality B)": records["p-value(normality A)"],
+            "p-value(equal variance)": records["p-value(equal variance)"],
+            "p-value(parametric)": records["p-value(parametric)"],
+            "p-value(parametric - not equal variance)": records[
+                "p-value(parametric - not equal variance)"
+            ],
+            "p-value(non-parametric)": records["p-value(non-parametric)"],
+        }
+    )
+
+
+def read_precomputed_records(path: str, group_A: str, group_B: str) -> t.Optional[pd.DataFrame]:
+    """
+    Function to read records of group_A vs group_B comparison from results store exported by the data processing
+    pipeline [one row group per pair of sample groups], only row groups of the requested pair are read.
+    If only group_B vs group_A comparison is precomputed, records are derived by swap_groups.
+
+    :param path: path to results store of platform
+    :param group_A:
+    :param group_B:
+    :return Optional[pd.DataFrame]: records as returned by compare_groups, None if pair is not precomputed
+    """
+    if not exists(path):
+        return None
+
+    for first, second in ((group_A, group_B), (group_B, group_A)):
+        records = pd.read_parquet(
+            path, filters=[("group_A", "==", first), ("group_B", "==", second)]
+        )
+
+        if not records.empty:
+            records = records.drop(columns=["group_A", "group_B"]).rename(
+                columns={"Mean(A)": f"Mean({first})", "Mean(B)": f"Mean({second})"}
+            )
+            if first == group_A:
+                return records.reset_index(drop=True)
+            return swap_groups(records, first, second)
+
+    return None
+
+
+def apply_thresholds(
+    records: pd.DataFrame, data_type: str, alpha: float, effect_size: float
+) -> pd.DataFrame:
+    """
+    Function to build statistics frame from threshold independent records [output of compare_groups].
+    For each feature test is selected based on normality of both groups and equality of variances:
+    Student t-test, Welch t-test or Mann-Whitney U test, then FDR and DEG/DMP status are assigned.
+    Only thresholds are applied, so the frame is rebuilt in milliseconds when alpha or effect size changes.
+
+    :param records:
+    :param data_type:
+    :param alpha:
+    :param effect_size:
+    :return pd.DataFrame:
+    """
+    normal = (records["p-value(normality A)"] > alpha) & (records["p-value(normality B)"] > alpha)
+    parametric = normal & (records["p-value(equal variance)"] > alpha)
+    welch = normal & (records["p-value(equal variance)"] <= alpha)
+
+    status = np.select(
+        [parametric, welch], ["parametric", "parametric - not equal variance"], "non-parametric"
+    )
+    diff_pvalue = np.select(
+        [parametric, welch],
+        [records["p-value(parametric)"], records["p-value(parametric - not equal variance)"]],
+        records["p-value(non-parametric)"],
+    )
+
+    frame = records.drop(columns=TEST_COLUMNS)
+    frame["Status"] = status
+    frame["p-value"] = diff_pvalue
+    with np.errstate(divide="ignore"):
+        frame["-log10(p-value)"] = -np.log10(diff_pvalue)
+
+    _, frame["FDR"] = fdrcorrection(frame["p-value"])
+    frame["-log10(FDR)"] = frame["FDR"].map(lambda value: -np.log10(value))
+    frame = frame.sort_values("-log10(FDR)", ascending=False)
+    frame = frame.set_index("Feature")
+
+    if data_type == "Expression [RNA-seq]":
+        frame["DEG/DMP"] = (frame["FDR"] <= alpha) & (frame["log2(FC)"].abs() >= effect_size)
+    else:
+        frame["DEG/DMP"] = (frame["FDR"] <= alpha) & (frame["delta"].abs() >= effect_size)
+
+    return frame.sort_values("DEG/DMP", ascending=False)
+
 
 class DifferentialFeatures:
     def __init__(
@@ -28,65 +343,65 @@ class DifferentialFeatures:
         self.stats_frame = None
         self.records = []
 
-    def identify_differential_features(self) -> None:
+    def identify_differential_features(
+        self,
+        n_processes: int = 1,
+        chunk_size: int = 5000,
+        progress: t.Optional[t.Callable[[int, int], None]] = None,
+        partial: t.Optional[t.Callable[[int, int, pd.DataFrame], None]] = None,
+    ) -> None:
         """
         Method to identify DMPs or DEGs using uni-variate analysis analysis.
+        Features are ordered by variance [descending] and split into chunks tested in a pool of n_processes worker
+        processes [in the current process if n_processes is 1], so the most variable features are tested first.
+        Records are merged in the order of features, regardless of the order of completion.
 
+        :param n_processes:
+        :param chunk_size: number of features per chunk
+        :param progress: called with number of completed and total chunks after each completed chunk
+        :param partial: called with number of completed and total chunks and records of completed chunks
         :return None:
         """
-        group_a = self.data_frame[self.samples_A]
-        group_b = self.data_frame[self.samples_B]
-
-        for var in self.variables:
-            group_a_temp = group_a.loc[var].values.flatten()
-            group_b_temp = group_b.loc[var].values.flatten()
-
-            _, norm_a = sts.shapiro(group_a_temp)
-            _, norm_b = sts.shapiro(group_b_temp)
-            _, var_a_b = sts.levene(group_a_temp, group_b_temp)
-
-            if norm_a > self.alpha and norm_b > self.alpha and var_a_b > self.alpha:
-                status = "parametric"
-                _, diff_pvalue = sts.ttest_ind(group_a_temp, group_b_temp, equal_var=True)
-
-            elif norm_a > self.alpha >= var_a_b and norm_b > self.alpha:
-                status = "parametric - not equal variance"
-                _, diff_pvalue = sts.ttest_ind(group_a_temp, group_b_temp, equal_var=False)
-
-            else:
-                status = "non-parametric"
-                _, diff_pvalue = sts.mannwhitneyu(group_a_temp, group_b_temp)
-
-            log10_diff_pvalue = -np.log10(diff_pvalue)
-            group_a_temp_mean = np.mean(group_a_temp)
-            group_b_temp_mean = np.mean(group_b_temp)
-
-            if group_b_temp_mean != 0:
-                fc = group_a_temp_mean / group_b_temp_mean
-                log_fc = np.log2(fc)
-            else:
-                fc = np.NaN
-                log_fc = np.NaN
-
-            hedges = pg.compute_effsize(group_a_temp, group_b_temp, paired=False, eftype="hedges")
-            delta = group_a_temp_mean - group_b_temp_mean
-            abs_delta = abs(delta)
-
-            record = {
-                "Feature": var,
-                f"Mean({self.group_A})": group_a_temp_mean,
-                f"Mean({self.group_B})": group_b_temp_mean,
-                "FC": fc,
-                "log2(FC)": log_fc,
-                "delta": delta,
-                "|delta|": abs_delta,
-                "Hedge`s g": hedges,
-                "Status": status,
-                "p-value": diff_pvalue,
-                "-log10(p-value)": log10_diff_pvalue,
-            }
-
-            self.records.append(record)
+        group_a = self.data_frame[self.samples_A].to_numpy(dtype=np.float64)
+        group_b = self.data_frame[self.samples_B].to_numpy(dtype=np.float64)
+        order = np.argsort(-np.hstack([group_a, group_b]).var(axis=1), kind="stable")
+
+        chunks = [
+            (
+                self.variables[order[start : start + chunk_size]],
+                group_a[order[start : start + chunk_size]],
+                group_b[order[start : start + chunk_size]],
+                self.group_A,
+                self.group_B,
+            )
+            for start in range(0, max(self.variables.size, 1), chunk_size)
+        ]
+        records = [None] * len(chunks)
+
+        def report(completed: int) -> None:
+            if progress:
+                progress(completed, len(chunks))
+            if partial and completed < len(chunks):
+                done = [record for record in records if record is not None]
+                partial(completed, len(chunks), pd.concat(done, ignore_index=True))
+
+        if n_processes > 1 and len(chunks) > 1:
+            with ProcessPoolExecutor(max_workers=min(n_processes, len(chunks))) as pool:
+                futures = {
+                    pool.submit(compare_groups, *chunk): position
+                    for position, chunk in enumerate(chunks)
+                }
+                for completed, future in enumerate(as_completed(futures), start=1):
+                    records[futures[future]] = future.result()
+                    report(completed)
+
+        else:
+            for position, chunk in enumerate(chunks):
+                records[position] = compare_groups(*chunk)
+                report(position + 1)
+
+        records = pd.concat(records, ignore_index=True)
+        self.records = records.iloc[np.argsort(order)].reset_index(drop=True)
 
     def build_statistics_frame(self) -> None:
         """
@@ -94,30 +409,15 @@ class DifferentialFeatures:
 
         :return None:
         """
-        frame = pd.DataFrame(self.records)
-
-        _, frame["FDR"] = fdrcorrection(frame["p-value"])
-        frame["-log10(FDR)"] = frame["FDR"].map(lambda value: -np.log10(value))
-        frame = frame.sort_values("-log10(FDR)", ascending=False)
-        frame = frame.set_index("Feature")
-
-        if self.data_type == "Expression [RNA-seq]":
-            frame["DEG/DMP"] = (frame["FDR"] <= self.alpha) & (
-                frame["log2(FC)"].abs() >= self.effect_size
-            )
-        else:
-            frame["DEG/DMP"] = (frame["FDR"] <= self.alpha) & (
-                frame["delta"].abs() >= self.effect_size
-            )
-
-        frame = frame.sort_values("DEG/DMP", ascending=False)
-        self.stats_frame = frame
+        self.stats_frame = apply_thresholds(
+            self.records, self.data_type, self.alpha, self.effect_size
+        )
 
     def export(self, path: str) -> None:
         """
-        Method to export stats_frame object as a parquet file.
+        Method to export threshold independent records as a parquet file, atomically.
 
         :param path:
         :return None:
         """
-        self.stats_frame.to_parquet(path)
+        write_parquet(self.records, path)
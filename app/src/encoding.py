@@ -0,0 +1,48 @@
+import json
+import typing as t
+
+import numpy as np
+import pandas as pd
+
+from .exceptions import UnknownEncoding
+
+METADATA_KEY = b"edave.encoding"
+
+
+def parse_encoding(metadata: t.Optional[t.Dict[bytes, bytes]]) -> t.Optional[dict]:
+    """
+    Function returns encoding record stored by the pipeline in schema metadata of processed frame,
+    or None if frame was written without encoding.
+
+    :param metadata:
+    :return Optional[dict]:
+    """
+    if not metadata or METADATA_KEY not in metadata:
+        return None
+
+    return json.loads(metadata[METADATA_KEY])
+
+
+def decode_frame(frame: pd.DataFrame, record: t.Optional[dict]) -> pd.DataFrame:
+    """
+    Function decodes values of processed frame [float32 or fixed-point uint16] back to float64.
+    Encodings are documented in data-processing-pipeline/src/encoding.py, which uses this implementation.
+
+    :param frame:
+    :param record: encoding record, None for frames written without encoding
+    :return pd.DataFrame:
+    """
+    if record is None or record["encoding"] == "float64":
+        return frame
+
+    if record["encoding"] == "float32":
+        return frame.astype(np.float64)
+
+    if record["encoding"] == "uint16":
+        codes = frame.to_numpy()
+        values = codes / record["scale"]
+        values[codes == record["missing"]] = np.nan
+
+        return pd.DataFrame(values, index=frame.index, columns=frame.columns)
+
+    raise UnknownEncoding(f"Unknown encoding: {record['encoding']}.")
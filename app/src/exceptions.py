@@ -0,0 +1,2 @@
+class UnknownEncoding(Exception):
+    pass
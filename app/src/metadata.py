@@ -0,0 +1,160 @@
+import threading
+import typing as t
+from os.path import exists, getmtime, join
+
+import numpy as np
+import pandas as pd
+
+from .utils import load_config
+
+config = load_config()
+
+
+class FeatureSet:
+    def __init__(self, features: t.Optional[t.Iterable[str]]):
+        """
+        Compact, read-only set of features [genes or CpGs] stored as sorted array of bytes.
+        Membership is tested by binary search.
+
+        :param features:
+        """
+        features = sorted(features or [])
+        self.features = np.array([feature.encode() for feature in features], dtype=np.bytes_)
+
+    def __contains__(self, feature: str) -> bool:
+        if not isinstance(feature, str) or self.features.size == 0:
+            return False
+
+        feature = feature.encode()
+        position = np.searchsorted(self.features, feature)
+        return position < self.features.size and self.features[position] == feature
+
+    def __iter__(self) -> t.Iterator[str]:
+        return (feature.decode() for feature in self.features)
+
+    def __len__(self) -> int:
+        return self.features.size
+
+    def __bool__(self) -> bool:
+        return self.features.size > 0
+
+
+class MetadataService:
+    def __init__(self, base_path: str):
+        """
+        Process-wide service providing metadata records of sample groups.
+        Each record is unpickled once per process and reloaded when metadata file changes on disk.
+        Sets of genes and probes are kept as compact FeatureSet objects.
+
+        :param base_path:
+        """
+        self.base_path = base_path
+        self._records: t.Dict[str, t.Tuple[float, dict]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, sample_group: str) -> dict:
+        """
+        Method returns metadata record for requested sample group.
+
+        :param sample_group:
+        :return dict:
+        """
+        path = join(self.base_path, sample_group, "metadata.pkl")
+        mtime = getmtime(path)
+
+        with self._lock:
+            if sample_group in self._records and self._records[sample_group][0] == mtime:
+                return self._records[sample_group][1]
+
+        record = self.__compact(pd.read_pickle(path))
+
+        with self._lock:
+            self._records[sample_group] = (mtime, record)
+
+        return record
+
+    @staticmethod
+    def __compact(record: dict) -> dict:
+        """
+        Method converts large sets of features into compact representation.
+
+        :param record:
+        :return dict:
+        """
+        record = record.copy()
+
+        for key in ("genes", "probes"):
+            record[key] = FeatureSet(record[key])
+
+        for key in ("expressionSamples", "methylationSamples", "commonBetween"):
+            if record[key] is not None:
+                record[key] = frozenset(record[key])
+
+        return record
+
+
+class FeatureGroupsIndex:
+    def __init__(self, path: str):
+        """
+        Global inverted index: feature [gene or probe] -> bitmap of sample groups containing it.
+        Index is loaded once per process and reloaded when file changes on disk.
+
+        :param path:
+        """
+        self.path = path
+        self._index: t.Optional[t.Tuple[float, dict]] = None
+        self._lock = threading.Lock()
+
+    def __load(self) -> t.Optional[dict]:
+        """
+        Method returns index records per platform, or None if index is not available.
+
+        :return Optional[dict]:
+        """
+        if not exists(self.path):
+            return None
+
+        mtime = getmtime(self.path)
+        with self._lock:
+            if self._index is None or self._index[0] != mtime:
+                self._index = (mtime, pd.read_pickle(self.path))
+
+            return self._index[1]
+
+    def present_in(
+        self, platform: str, variables: t.Collection[str], sample_groups: t.Collection[str]
+    ) -> t.Optional[t.Dict[str, t.List[str]]]:
+        """
+        Method returns variables present in each of requested sample groups [in order of variables].
+        If index is not available method returns None.
+
+        :param platform:
+        :param variables:
+        :param sample_groups:
+        :return Optional[Dict[str, List[str]]]:
+        """
+        index = self.__load()
+        if index is None:
+            return None
+
+        record = index[platform]
+        positions = {group: position for position, group in enumerate(record["groups"])}
+        present = {group: [] for group in sample_groups}
+
+        for variable in variables:
+            feature = variable.encode()
+            row = np.searchsorted(record["features"], feature)
+
+            if row == record["features"].size or record["features"][row] != feature:
+                continue
+
+            membership = np.unpackbits(record["bitmap"][row], count=len(record["groups"]))
+            for group in sample_groups:
+                if group in positions and membership[positions[group]]:
+                    present[group].append(variable)
+
+        return present
+
+
+metadata_service = MetadataService(config["base_path"])
+feature_groups_index = FeatureGroupsIndex(config["feature_groups_index"])
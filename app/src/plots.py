@@ -1,3 +1,4 @@
+import math
 import typing as t
 
 import pandas as pd
@@ -127,6 +128,58 @@ class Plot:
 
         return fig
 
+    def panelplot(self, plot_type: str = "Box", n_columns: int = 5) -> Figure:
+        """
+        Method to generate small multiples [one panel per feature] of box, violin or scatter plots.
+        Data is expected in wide format [samples x features + x axis column], y axis describes values of features.
+
+        :param plot_type: Box, Violin or Scatter
+        :param n_columns:
+        :return Fig:
+        """
+        features = [column for column in self.data.columns if column != self.x_axis]
+        data = self.data.reset_index().melt(
+            id_vars=[self.names.name, self.x_axis],
+            value_vars=features,
+            var_name="Feature",
+            value_name=self.y_axis,
+        )
+        data = data.dropna(subset=[self.y_axis])
+
+        if plot_type == "Box":
+            plot = px.box
+        elif plot_type == "Violin":
+            plot = px.violin
+        else:
+            plot = px.strip
+
+        n_rows = math.ceil(len(features) / n_columns)
+        fig = plot(
+            data_frame=data,
+            x=self.x_axis,
+            y=self.y_axis,
+            color=self.x_axis,
+            facet_col="Feature",
+            facet_col_wrap=n_columns,
+            facet_row_spacing=min(0.05, 1 / max(n_rows, 2)),
+            category_orders={"Feature": features},
+            hover_data=[self.names.name],
+        )
+        fig.for_each_annotation(
+            lambda annotation: annotation.update(text=annotation.text.split("=")[-1])
+        )
+        fig.update_yaxes(matches=None, showticklabels=True, title="")
+        fig.update_xaxes(title="", showticklabels=self.show_x_ticks)
+        fig.update_layout(
+            title=self.__yaxis_title(),
+            font={"size": self.font_size - 4},
+            legend={"title": "", "orientation": "h", "y": -0.1},
+            showlegend=self.show_legend,
+            height=250 * n_rows + 150,
+        )
+
+        return fig
+
     def volcanoplot(self, x_border: float, y_border: float) -> Figure:
         """
         Method to generate volcanoplot.
@@ -6,6 +6,8 @@ from dash import dash_table
 from sklearn.cluster import AgglomerativeClustering
 from sklearn.metrics import calinski_harabasz_score
 
+from .normality import shapiro_wilk
+
 
 class Stats:
     def __init__(self, data: pd.DataFrame, factor: str, alpha: float = 0.05):
@@ -45,8 +47,7 @@ class Stats:
             self.data.loc[ids, dependent_var].values
             for ids in self.data.groupby(self.factor).groups.values()
         ]
-        stats = [sts.shapiro(record)[1] for record in records]
-        stats = np.array(stats)
+        stats = np.array([shapiro_wilk(record[np.newaxis, :])[1][0] for record in records])
 
         if all(stats > self.alpha):
             self.normality = True
@@ -1,6 +1,7 @@
 import json
-from os import makedirs
-from os.path import exists, join
+from os import close, makedirs, remove, replace
+from os.path import dirname, exists, getmtime, join
+from tempfile import mkstemp
 
 import pandas as pd
 from dotenv import dotenv_values
@@ -54,28 +55,58 @@ def load_config(path: str = "config.json") -> dict:
 
 
 def temp_file_path(
-        data_type: str, group_A: str, group_B: str, alpha: float, effect: float, base: str = "temp/"
+        data_type: str, group_A: str, group_B: str, version: str, base: str = "temp/"
 ) -> str:
     """
     Function to generate path to temp file.
+    Path does not depend on thresholds [alpha, effect size], so results are reused when only thresholds change.
 
     :param data_type:
     :param group_A:
     :param group_B:
-    :param alpha:
-    :param effect:
+    :param version: version of data repository
     :param base:
     :return str:
     """
     makedirs(base, exist_ok=True)
 
-    file_name = f"{data_type}_{group_A}_{group_B}_{alpha}_{effect}.parquet"
+    file_name = f"{data_type}_{group_A}_{group_B}_{version}.parquet"
     file_name = file_name.replace("/", "-")
     path = join(base, file_name)
 
     return path
 
 
+def write_parquet(frame: pd.DataFrame, path: str) -> None:
+    """
+    Function to write frame as a parquet file atomically: frame is written to a temporary file in the same
+    directory, which is then moved onto path. Readers checking if path exists never see a partially written file.
+
+    :param frame:
+    :param path:
+    :return None:
+    """
+    descriptor, temp_path = mkstemp(dir=dirname(path) or ".", suffix=".tmp")
+    close(descriptor)
+
+    try:
+        frame.to_parquet(temp_path)
+        replace(temp_path, path)
+    except BaseException:
+        remove(temp_path)
+        raise
+
+
+def repository_version(path: str) -> str:
+    """
+    Function to identify version of data repository by modification time of metadata file exported by the pipeline.
+
+    :param path:
+    :return str:
+    """
+    return str(int(getmtime(path)))
+
+
 def load_news(path: str = "text.news") -> str:
     """
     Function to load news from news file.
@@ -1,9 +1,28 @@
+import io
+import os
 import pickle
-from os.path import join
+from os.path import exists, getmtime, join
 
 import numpy as np
 import pandas as pd
-from src.basics import FrameOperations
+import pingouin as pg
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+import scipy.stats as sts
+from src.basics import FrameOperations, export_sample_sheet, frame_cache
+from src.cache import FrameCache
+from src.differential_features import (
+    DifferentialFeatures,
+    apply_thresholds,
+    read_precomputed_records,
+    swap_groups,
+)
+from src.encoding import decode_frame, parse_encoding
+from src.exceptions import UnknownEncoding
+from src.metadata import FeatureSet, feature_groups_index, metadata_service
+from src.normality import benchmark_shapiro, shapiro_wilk
+from src.utils import load_config, write_parquet
 
 
 def test_load_whole_dataset_exp():
@@ -30,6 +49,19 @@ def test_load_whole_dataset_met():
     assert frame.empty is False, "Loaded frame is empty"
 
 
+def test_iter_csv():
+    fo = FrameOperations(data_type="Expression [RNA-seq]", sample_types=None)
+    with open(join(fo.basic_path, "global_metadata_file.pkl"), "rb") as file:
+        file = pickle.load(file)
+        fo.sample_types = file["Expression_files_present"][0]
+
+    chunks = list(fo.iter_csv())
+    frame = fo.load_whole_dataset()
+
+    assert len(chunks) > 0, "No chunks exported."
+    assert "".join(chunks) == frame.to_csv(), "Streamed CSV does not match dataset."
+
+
 def test_load_1d_exp():
     fo = FrameOperations(data_type="Expression [RNA-seq]", sample_types=None)
     with open(join(fo.basic_path, "global_metadata_file.pkl"), "rb") as file:
@@ -73,6 +105,29 @@ def test_load_1d_negative():
     assert frame.empty is True, "Loaded frame is not empty."
 
 
+def test_load_all_groups_1d():
+    fo = FrameOperations(data_type="Expression [RNA-seq]", sample_types=None)
+    with open(join(fo.basic_path, "global_metadata_file.pkl"), "rb") as file:
+        file = pickle.load(file)
+        fo.sample_types = file["Expression_files_present"][:2]
+
+    frame, _ = fo.load_all_groups_1d("TP53")
+    expected, _ = fo.load_1d("TP53")
+    subset = frame[frame["SampleType"].isin(fo.sample_types)]
+
+    assert set(frame.columns) == {"TP53", "SampleType"}, "Wrong columns."
+    assert list(subset.index) == list(expected.index), "Wrong samples."
+    assert np.allclose(subset["TP53"], expected["TP53"], rtol=1e-6), "Wrong values."
+
+
+def test_load_all_groups_1d_negative():
+    fo = FrameOperations(data_type="Methylation [450K/EPIC]", sample_types=None)
+    frame, msg = fo.load_all_groups_1d("SOX")
+
+    assert frame.empty, "Frame should be empty."
+    assert msg == "CpG: 'SOX' not found in repository", "Wrong message."
+
+
 def test_load_many_exp():
     fo = FrameOperations(data_type="Expression [RNA-seq]", sample_types=None)
     with open(join(fo.basic_path, "global_metadata_file.pkl"), "rb") as file:
@@ -106,6 +161,20 @@ def test_load_many_met():
     assert bool(frame.isna().sum().any()) is False, "Frame contains NaNs."
 
 
+def test_load_panel():
+    fo = FrameOperations(data_type="Expression [RNA-seq]", sample_types=None)
+    with open(join(fo.basic_path, "global_metadata_file.pkl"), "rb") as file:
+        file = pickle.load(file)
+        fo.sample_types = file["Expression_files_present"][:3]  # load only 3 files
+
+    frame, not_found = fo.load_panel(["TP53", "AIM2", "SOX"])
+    expected, _ = fo.load_1d("TP53")
+
+    assert list(frame.columns) == ["TP53", "AIM2", "SampleType"], "Wrong columns."
+    assert not_found == {"SOX": fo.sample_types}, "Wrong not found report."
+    assert np.allclose(frame.loc[expected.index, "TP53"], expected["TP53"]), "Wrong values."
+
+
 def test_load_many_mvf_exp():
     fo = FrameOperations(data_type="Expression [RNA-seq]", sample_types=None)
     with open(join(fo.basic_path, "global_metadata_file.pkl"), "rb") as file:
@@ -140,6 +209,24 @@ def test_load_many_mvf_met():
     assert bool(frame_2.isna().sum().any()) is False, "Frame 2 contains NaNs."
 
 
+def test_stack():
+    fo = FrameOperations(data_type="Expression [RNA-seq]", sample_types=None)
+    with open(join(fo.basic_path, "global_metadata_file.pkl"), "rb") as file:
+        file = pickle.load(file)
+        fo.sample_types = file["Expression_files_present"][:3]  # load only 3 files
+
+    axis = fo._canonical_axis()
+    positions = np.arange(0, axis.size, max(axis.size // 100, 1))
+    frame, sample_frame, _ = fo._stack(positions)
+
+    expected = pd.concat([fo._read_frame(st) for st in fo.sample_types], axis=1)
+    expected = expected.reindex(axis[positions])
+
+    assert frame.shape == expected.shape, "Wrong shape of stacked frame."
+    assert np.allclose(frame.values, expected.values, equal_nan=True), "Wrong stacked values."
+    assert (sample_frame.index == frame.columns).all(), "Sample types do not match samples."
+
+
 def test_load_met_exp_frame():
     fo = FrameOperations(data_type="Methylation [450K/EPIC]", sample_types=None)
     with open(join(fo.basic_path, "global_metadata_file.pkl"), "rb") as file:
@@ -167,6 +254,28 @@ def test_load_met_exp_frame_neg():
     assert frame.empty is True, "Frame should be empty."
 
 
+def test_storage_stats():
+    fo = FrameOperations(data_type="Expression [RNA-seq]", sample_types=None)
+    with open(join(fo.basic_path, "global_metadata_file.pkl"), "rb") as file:
+        file = pickle.load(file)
+        fo.sample_types = file["Expression_files_present"][:2]
+
+    stats = fo.storage_stats()
+
+    assert stats.shape[0] == 2, "Storage stats should be reported per sample type."
+    assert {"compression_ratio", "throughput_mb_s"}.issubset(stats.columns), "Missing columns."
+
+
+def test_export_sample_sheet():
+    path = load_config()["sample_sheet"]
+    export = export_sample_sheet(path, getmtime(path), "csv")
+    sample_sheet = pd.read_csv(io.BytesIO(export), compression="gzip", index_col=0)
+    exported = pd.read_parquet(io.BytesIO(export_sample_sheet(path, getmtime(path), "parquet")))
+
+    assert sample_sheet.shape == exported.shape, "Exports differ."
+    assert export is export_sample_sheet(path, getmtime(path), "csv"), "Export should be cached."
+
+
 def test_binning():
     frame = pd.Series(np.linspace(0, 100, 100), name="XYZ")
     binned = FrameOperations.bin_variable(frame, n_bins=3)
@@ -188,3 +297,313 @@ def test_scaling_2():
     scaled = FrameOperations.scale(frame, None)
 
     assert frame.equals(scaled), "Scaling error."
+
+
+def test_frame_cache():
+    frame = pd.DataFrame(np.ones((100, 10)))
+    size = frame.memory_usage(index=True, deep=True).sum()
+    cache = FrameCache(max_bytes=int(size * 2.5))
+
+    cache.put(("A", "RNA-Seq", 1.0), frame)
+    cache.put(("B", "RNA-Seq", 1.0), frame)
+    assert cache.get(("A", "RNA-Seq", 1.0)) is frame, "Cached frame not returned."
+
+    cache.put(("C", "RNA-Seq", 1.0), frame)  # evicts least recently used - B
+    assert cache.get(("B", "RNA-Seq", 1.0)) is None, "LRU frame not evicted."
+    assert cache.current_bytes <= cache.max_bytes, "Memory budget exceeded."
+
+    cache.put(("A", "RNA-Seq", 2.0), frame)  # new mtime replaces stale entry
+    assert cache.get(("A", "RNA-Seq", 1.0)) is None, "Stale frame not dropped."
+    assert cache.stats == {
+        "hits": 1,
+        "misses": 2,
+        "evictions": 1,
+        "entries": 2,
+        "bytes": 2 * size,
+        "max_bytes": int(size * 2.5),
+    }, "Wrong cache counters."
+
+
+def test_frame_cache_point_reads():
+    fo = FrameOperations(data_type="Expression [RNA-seq]", sample_types=None)
+    with open(join(fo.basic_path, "global_metadata_file.pkl"), "rb") as file:
+        fo.sample_types = pickle.load(file)["Expression_files_present"][:2]
+
+    # row groups are cached for sources read through sidecar index without Arrow IPC copy
+    row_group_reads = [
+        st
+        for st in fo.sample_types
+        if exists(join(fo.basic_path, st, "RNA-Seq.index.pkl"))
+        and not exists(join(fo.basic_path, st, "RNA-Seq.arrow"))
+    ]
+
+    frame_cache.clear()
+    first, _ = fo.load_1d("TP53")
+    before = frame_cache.stats
+    second, _ = fo.load_1d("TP53")
+    after = frame_cache.stats
+
+    pd.testing.assert_frame_equal(first, second)
+    assert after["hits"] - before["hits"] == len(
+        row_group_reads
+    ), "Point read not served from cache."
+    assert after["misses"] == before["misses"], "Repeated point read counted as a miss."
+
+
+def test_read_frame_ipc():
+    fo = FrameOperations(data_type="Expression [RNA-seq]", sample_types=None)
+    with open(join(fo.basic_path, "global_metadata_file.pkl"), "rb") as file:
+        sample_types = pickle.load(file)["Expression_files_present"]
+
+    # index of memory-mapped Arrow IPC copy is built once and shared by all frames read from it
+    for st in [st for st in sample_types if exists(join(fo.basic_path, st, "RNA-Seq.arrow"))]:
+        first, second = fo._read_frame(st), fo._read_frame(st)
+        path = join(fo.basic_path, st, "RNA-Seq.parquet")
+        expected = decode_frame(
+            pd.read_parquet(path), parse_encoding(pq.read_schema(path).metadata)
+        )
+
+        pd.testing.assert_frame_equal(first, expected)
+        assert first.index is second.index, "Index of Arrow IPC copy rebuilt."
+
+
+def test_feature_set():
+    features = FeatureSet({"cg07779434", "cg00000029", "TP53"})
+
+    assert "cg07779434" in features, "Feature not found in set."
+    assert "cg0777943" not in features and "XXX" not in features, "Unknown feature found in set."
+    assert len(features) == 3 and set(features) == {"cg07779434", "cg00000029", "TP53"}
+    assert not FeatureSet(None), "Empty set should be falsy."
+
+
+def test_metadata_service():
+    with open(join(metadata_service.base_path, "global_metadata_file.pkl"), "rb") as file:
+        file = pickle.load(file)
+        st = file["Methylation_files_present"][0]
+
+    record = metadata_service.get(st)
+    raw_record = pd.read_pickle(join(metadata_service.base_path, st, "metadata.pkl"))
+
+    assert metadata_service.get(st) is record, "Record should be loaded once per process."
+    assert set(record["probes"]) == raw_record["probes"], "Probes set wrongly converted."
+    assert (
+        record["methylationSamples"] == raw_record["methylationSamples"]
+    ), "Samples set wrongly converted."
+
+
+def test_feature_groups_index():
+    with open(join(metadata_service.base_path, "global_metadata_file.pkl"), "rb") as file:
+        file = pickle.load(file)
+        st = file["Expression_files_present"][:3]  # check only 3 sample types
+
+    present = feature_groups_index.present_in("RNA-Seq", ["TP53", "XXX"], st)
+
+    assert list(present) == st, "Sample types not consistent with input."
+    for sample_type in st:
+        expected = [
+            gene for gene in ["TP53", "XXX"] if gene in metadata_service.get(sample_type)["genes"]
+        ]
+        assert present[sample_type] == expected, "Index not consistent with metadata."
+
+
+def test_decode_frame():
+    codes = pd.DataFrame({"A": np.array([0, 32767, 65534, 65535], dtype=np.uint16)})
+    record = {"encoding": "uint16", "scale": 65534, "missing": 65535}
+    frame = decode_frame(codes, record)
+
+    assert frame["A"].dtype == np.float64, "Frame is not decoded to float64."
+    assert np.allclose(frame["A"].iloc[:3], [0, 32767 / 65534, 1]), "Wrong decoded values."
+    assert np.isnan(frame["A"].iloc[3]), "Missing value is not decoded as NaN."
+    assert decode_frame(codes, None) is codes, "Frame without encoding should be returned as is."
+
+    with pytest.raises(UnknownEncoding):
+        decode_frame(codes, {"encoding": "int8"})
+
+
+def test_differential_features():
+    rng = np.random.default_rng(0)
+    values = np.vstack([rng.normal(0, 1, (20, 20)), rng.gamma(1, 1, (20, 20)) + 1])
+    values[:20, :8] += 2
+    frame = pd.DataFrame(values, columns=[f"S{i}" for i in range(20)])
+    samples = pd.Series(["A"] * 8 + ["B"] * 12, index=frame.columns)
+
+    diff = DifferentialFeatures("Expression [RNA-seq]", frame, samples, "A", "B", 0.05, 1.0)
+    diff.identify_differential_features()
+    diff.build_statistics_frame()
+    stats = diff.stats_frame
+
+    for feature, record in stats.iterrows():
+        group_a, group_b = values[feature, :8], values[feature, 8:]
+        if record["Status"] == "parametric":
+            _, expected = sts.ttest_ind(group_a, group_b, equal_var=True)
+        elif record["Status"] == "parametric - not equal variance":
+            _, expected = sts.ttest_ind(group_a, group_b, equal_var=False)
+        else:
+            _, expected = sts.mannwhitneyu(group_a, group_b)
+        hedges = pg.compute_effsize(group_a, group_b, paired=False, eftype="hedges")
+
+        assert np.isclose(record["p-value"], expected), "Wrong p-value."
+        assert np.isclose(record["Hedge`s g"], hedges), "Wrong Hedges` g."
+        assert np.isclose(record["delta"], group_a.mean() - group_b.mean()), "Wrong delta."
+
+    assert set(stats["Status"]) == {"parametric", "non-parametric"}, "Wrong test selection."
+
+
+def test_shapiro_wilk():
+    rng = np.random.default_rng(0)
+    for n in (3, 4, 5, 6, 11, 12, 50):
+        values = np.vstack([rng.normal(0, 1, (10, n)), rng.gamma(0.5, 1, (10, n)), np.ones((1, n))])
+        statistics, pvalues = shapiro_wilk(values)
+        expected = np.array([sts.shapiro(row) for row in values])
+
+        assert np.allclose(statistics, expected[:, 0], atol=1e-6), f"Wrong W statistics, n = {n}."
+        assert np.allclose(pvalues, expected[:, 1], atol=1e-6), f"Wrong p-values, n = {n}."
+
+
+def test_benchmark_shapiro():
+    benchmark = benchmark_shapiro(n_features=200, n_samples=(10, 30), repeats=1)
+
+    assert list(benchmark.index) == [10, 30], "Benchmark should be reported per sample size."
+    assert (benchmark["max_pvalue_difference"] < 1e-6).all(), "Kernel does not match scipy."
+
+
+def test_differential_features_parallel():
+    rng = np.random.default_rng(1)
+    frame = pd.DataFrame(
+        rng.gamma(1, 1, (250, 20)),
+        index=[f"F{i}" for i in rng.permutation(250)],
+        columns=[f"S{i}" for i in range(20)],
+    )
+    frame = frame.mul(rng.uniform(0.1, 10, 250), axis=0)
+    samples = pd.Series(["A"] * 10 + ["B"] * 10, index=frame.columns)
+
+    progress, partial = [], []
+    sequential = DifferentialFeatures("Expression [RNA-seq]", frame, samples, "A", "B", 0.05, 1.0)
+    sequential.identify_differential_features()
+    parallel = DifferentialFeatures("Expression [RNA-seq]", frame, samples, "A", "B", 0.05, 1.0)
+    parallel.identify_differential_features(
+        n_processes=3,
+        chunk_size=60,
+        progress=lambda done, total: progress.append((done, total)),
+        partial=lambda done, total, records: partial.append((done, total, records)),
+    )
+
+    pd.testing.assert_frame_equal(sequential.records, parallel.records)
+    assert list(parallel.records["Feature"]) == list(frame.index), "Records in wrong order."
+    assert progress == [(done, 5) for done in range(1, 6)], "Wrong progress reported."
+
+    # chunks complete in any order, partial records hold whole chunks of completed features
+    assert [(done, total) for done, total, _ in partial] == [(done, 5) for done in range(1, 5)]
+    order = frame.var(axis=1, ddof=0).sort_values(ascending=False, kind="stable").index
+    chunks = [set(order[start : start + 60]) for start in range(0, 250, 60)]
+    for done, _, records in partial:
+        features = set(records["Feature"])
+        assert (
+            sum(chunk <= features for chunk in chunks) == done
+        ), "Partial records of wrong chunks."
+        assert len(features) == len(records), "Duplicate partial records."
+
+
+def test_differential_features_partial():
+    rng = np.random.default_rng(5)
+    frame = pd.DataFrame(rng.gamma(1, 1, (250, 20)), columns=[f"S{i}" for i in range(20)])
+    frame = frame.mul(rng.uniform(0.1, 10, 250), axis=0)
+    samples = pd.Series(["A"] * 10 + ["B"] * 10, index=frame.columns)
+
+    partial = []
+    diff = DifferentialFeatures("Expression [RNA-seq]", frame, samples, "A", "B", 0.05, 1.0)
+    diff.identify_differential_features(
+        chunk_size=60, partial=lambda done, total, records: partial.append((done, total, records))
+    )
+
+    assert [(done, total) for done, total, _ in partial] == [(done, 5) for done in range(1, 5)]
+    assert [len(records) for _, _, records in partial] == [60, 120, 180, 240]
+    assert list(diff.records["Feature"]) == list(frame.index), "Records in wrong order."
+
+    variance = frame.var(axis=1, ddof=0)
+    assert set(partial[0][2]["Feature"]) == set(variance.nlargest(60).index), "Wrong first batch."
+
+
+def test_apply_thresholds():
+    rng = np.random.default_rng(2)
+    frame = pd.DataFrame(rng.normal(5, 1, (100, 20)), columns=[f"S{i}" for i in range(20)])
+    frame.iloc[:30, :10] += 3
+    samples = pd.Series(["A"] * 10 + ["B"] * 10, index=frame.columns)
+
+    diff = DifferentialFeatures("Expression [RNA-seq]", frame, samples, "A", "B", 0.05, 0.5)
+    diff.identify_differential_features()
+
+    for alpha, effect_size in ((0.01, 0.1), (0.1, 0.5)):
+        stats = apply_thresholds(diff.records, "Expression [RNA-seq]", alpha, effect_size)
+        records = diff.records.set_index("Feature").loc[stats.index]
+        normality = records[["p-value(normality A)", "p-value(normality B)"]]
+        normal = (normality > alpha).all(axis=1)
+        expected = (stats["FDR"] <= alpha) & (stats["log2(FC)"].abs() >= effect_size)
+
+        assert (stats["DEG/DMP"] == expected).all(), "Wrong DEG/DMP classification."
+        assert ((stats["Status"] != "non-parametric") == normal).all(), "Wrong test selection."
+        assert "p-value(normality A)" not in stats.columns, "Test p-values should be dropped."
+
+
+def test_swap_groups():
+    rng = np.random.default_rng(3)
+    frame = pd.DataFrame(rng.gamma(2, 1, (50, 16)), columns=[f"S{i}" for i in range(16)])
+    frame.iloc[0, :9] = 0
+    samples = pd.Series(["A"] * 9 + ["B"] * 7, index=frame.columns)
+
+    results = []
+    for group_A, group_B in (("A", "B"), ("B", "A")):
+        diff = DifferentialFeatures(
+            "Expression [RNA-seq]", frame, samples, group_A, group_B, 0.05, 1
+        )
+        diff.identify_differential_features()
+        results.append(diff.records)
+
+    pd.testing.assert_frame_equal(swap_groups(results[0], "A", "B"), results[1])
+
+
+def test_write_parquet(tmp_path):
+    path = join(tmp_path, "records.parquet")
+    frame = pd.DataFrame({"Feature": ["A", "B"], "delta": [0.5, -0.5]})
+
+    write_parquet(frame, path)
+    pd.testing.assert_frame_equal(pd.read_parquet(path), frame)
+
+    with pytest.raises(Exception):
+        write_parquet(pd.DataFrame({"Feature": [1, "B"]}), join(tmp_path, "broken.parquet"))
+
+    assert sorted(os.listdir(tmp_path)) == ["records.parquet"], "Partial file left behind."
+
+
+def test_read_precomputed_records(tmp_path):
+    rng = np.random.default_rng(4)
+    frame = pd.DataFrame(rng.gamma(2, 1, (50, 30)), columns=[f"S{i}" for i in range(30)])
+    samples = pd.Series(["A"] * 10 + ["B"] * 8 + ["C"] * 12, index=frame.columns)
+
+    results = {}
+    for group_A, group_B in (("A", "B"), ("B", "A"), ("C", "A")):
+        diff = DifferentialFeatures(
+            "Expression [RNA-seq]", frame, samples, group_A, group_B, 0.05, 1
+        )
+        diff.identify_differential_features()
+        results[(group_A, group_B)] = diff.records
+
+    path = join(tmp_path, "RNA-Seq.parquet")
+    writer = None
+    for group_A, group_B in (("A", "B"), ("C", "A")):
+        records = results[(group_A, group_B)].rename(
+            columns={f"Mean({group_A})": "Mean(A)", f"Mean({group_B})": "Mean(B)"}
+        )
+        records.insert(0, "group_A", group_A)
+        records.insert(1, "group_B", group_B)
+        table = pa.Table.from_pandas(records, preserve_index=False)
+
+        writer = writer or pq.ParquetWriter(path, table.schema)
+        writer.write_table(table)
+    writer.close()
+
+    for pair in (("A", "B"), ("B", "A")):
+        pd.testing.assert_frame_equal(read_precomputed_records(path, *pair), results[pair])
+
+    assert read_precomputed_records(path, "B", "C") is None, "Pair is not precomputed."
+    assert read_precomputed_records(join(tmp_path, "missing.parquet"), "A", "B") is None
@@ -1,19 +1,37 @@
 import json
 import pickle
+from concurrent.futures import ProcessPoolExecutor
 from glob import glob
+from itertools import repeat
 from os import makedirs
-from os.path import exists, join
+from os.path import exists, getsize, join
 from pathlib import Path
 from subprocess import call
+from tempfile import TemporaryDirectory
+from time import perf_counter
 from typing import List
 
 import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
 import requests
 from prefect import flow, get_run_logger, task
+from pyarrow import feather
 from src.collector import SamplesCollector
+from src.differential import compare_pair, enumerate_pairs, group_statistics
+from src.encoding import (
+    benchmark_layouts,
+    parse_encoding,
+    read_encoding,
+    read_frame,
+    select_layout,
+    storage_dtype,
+    write_frame,
+)
 from src.exceptions import NonUniqueIndex, RepositoryExistsError
-from src.records import GlobalMetaRecord, MetaRecord, RepositorySummary
+from src.records import FeatureGroupsRecord, GlobalMetaRecord, MetaRecord, RepositorySummary
 from src.utils import load_config
 from tqdm import tqdm
 
@@ -22,8 +40,20 @@ config = load_config()
 GDC_TRANSFER_TOOL_EXECUTABLE = config["GDC_TRANSFER_TOOL_EXECUTABLE"]
 MIN_SAMPLES_PER_SAMPLE_GROUP = config["MIN_SAMPLES_PER_SAMPLE_GROUP"]
 MAX_SAMPLES_PER_SAMPLE_GROUP = config["MAX_SAMPLES_PER_SAMPLE_GROUP"]
+ROW_GROUP_SIZE = config["ROW_GROUP_SIZE"]
+METHYLATION_ENCODING = config["METHYLATION_ENCODING"]
+EXPRESSION_ENCODING = config["EXPRESSION_ENCODING"]
+EXPRESSION_LAYOUT = config["EXPRESSION_LAYOUT"]
+MAX_READ_SLOWDOWN = config["MAX_READ_SLOWDOWN"]
+DIFFERENTIAL_ANALYSIS = config["DIFFERENTIAL_ANALYSIS"]
+DIFFERENTIAL_SAMPLE_TYPE_PAIRS = config["DIFFERENTIAL_SAMPLE_TYPE_PAIRS"]
+DIFFERENTIAL_DIR = config["DIFFERENTIAL_DIR"]
+MVF_THRESHOLD = config["MVF_THRESHOLD"]
+STORAGE_REPORT_FILE = config["STORAGE_REPORT_FILE"]
+DOWNLOADS_DIR = config["DOWNLOADS_DIR"]
 GDC_RAW_RESPONSE_FILE = config["GDC_RAW_RESPONSE_FILE"]
 METADATA_GLOBAL_FILE = config["METADATA_GLOBAL_FILE"]
+FEATURE_GROUPS_INDEX_FILE = config["FEATURE_GROUPS_INDEX_FILE"]
 MIN_COMMON_SAMPLES = config["MIN_COMMON_SAMPLES"]
 INTERIM_BASE_PATH = config["INTERIM_BASE_PATH"]
 SAMPLE_SHEET_FILE = config["SAMPLE_SHEET_FILE"]
@@ -326,13 +356,20 @@ def build_met_frame(
     sample_sheet: str = SAMPLE_SHEET_FILE,
     interim_files_path: str = INTERIM_BASE_PATH,
     processed_dir: str = PROCESSED_DIR,
+    row_group_size: int = ROW_GROUP_SIZE,
+    encoding: str = METHYLATION_ENCODING,
 ) -> None:
     """
     Function builds data frames [Met] using interim data downloaded from GDC.
+    Frames are sorted by probe ID and split into small row groups, so min/max statistics of each row group
+    allow to read a single probe without decoding the whole file.
+    Beta values are stored using configured encoding [float64, float32 or fixed-point uint16, see src.encoding].
 
     :param sample_sheet:
     :param interim_files_path:
     :param processed_dir:
+    :param row_group_size:
+    :param encoding:
     :return: None
     """
     logger = get_run_logger()
@@ -362,9 +399,13 @@ def build_met_frame(
             makedirs(join(processed_dir, sample_group), exist_ok=True)
             frame = pd.concat(frame, axis=1)
             frame = frame.loc[:, ~frame.columns.duplicated(keep="first")]
+            frame = frame.sort_index()
 
-            frame.to_parquet(
-                join(processed_dir, sample_group, "Methylation Array.parquet"), index=True
+            write_frame(
+                frame,
+                join(processed_dir, sample_group, "Methylation Array.parquet"),
+                encoding=encoding,
+                row_group_size=row_group_size,
             )
             logger.info(f"Exporting Methylation frame for {sample_group}: {frame.shape}")
 
@@ -374,13 +415,25 @@ def build_exp_frame(
     sample_sheet: str = SAMPLE_SHEET_FILE,
     interim_files_path: str = INTERIM_BASE_PATH,
     processed_dir: str = PROCESSED_DIR,
+    row_group_size: int = ROW_GROUP_SIZE,
+    encoding: str = EXPRESSION_ENCODING,
+    layout: str = EXPRESSION_LAYOUT,
+    max_read_slowdown: float = MAX_READ_SLOWDOWN,
 ) -> None:
     """
     Function builds dataframe [Exp] using data downloaded from GDC.
+    Frames are sorted by gene name and split into small row groups, so min/max statistics of each row group
+    allow to read a single gene without decoding the whole file.
+    If layout is 'auto', parquet layout of each frame is chosen by benchmark: the smallest file among layouts
+    read at most max_read_slowdown times slower than the fastest one [see src.encoding].
 
     :param sample_sheet:
     :param interim_files_path:
     :param processed_dir:
+    :param row_group_size:
+    :param encoding:
+    :param layout:
+    :param max_read_slowdown:
     :return: None
     """
     logger = get_run_logger()
@@ -415,9 +468,24 @@ def build_exp_frame(
             makedirs(join(processed_dir, sample_group), exist_ok=True)
             frame = pd.concat(frame, axis=1)
             frame = frame.loc[:, ~frame.columns.duplicated(keep="first")]
-
-            frame.to_parquet(join(processed_dir, sample_group, "RNA-Seq.parquet"), index=True)
-            logger.info(f"Exporting Expression frame for {sample_group}: {frame.shape}")
+            frame = frame.sort_index()
+
+            frame_layout = layout
+            if layout == "auto":
+                benchmark = benchmark_layouts(frame, encoding, row_group_size)
+                frame_layout = select_layout(benchmark, max_read_slowdown)
+                logger.info(f"Layout benchmark for {sample_group}:\n{benchmark}")
+
+            write_frame(
+                frame,
+                join(processed_dir, sample_group, "RNA-Seq.parquet"),
+                encoding=encoding,
+                row_group_size=row_group_size,
+                layout=frame_layout,
+            )
+            logger.info(
+                f"Exporting Expression frame for {sample_group}: {frame.shape}, layout: {frame_layout}"
+            )
 
 
 @task
@@ -491,6 +559,128 @@ def metadata(processed_dir: str = PROCESSED_DIR) -> None:
         logger.info(f"Exporting metadata for {sample_group}")
 
 
+@task
+def feature_index(processed_dir: str = PROCESSED_DIR) -> None:
+    """
+    Function exports sidecar index file per each processed frame.
+    The index maps every gene or probe to its row group and row offset within that row group, which allows to read a
+    single feature without scanning the parquet file. Global row number is used for Arrow IPC copies.
+
+    :param processed_dir:
+    :return: None
+    """
+    logger = get_run_logger()
+
+    for source in tqdm(glob(join(processed_dir, "*", "*.parquet"))):
+        parquet_file = pq.ParquetFile(source)
+        index_column = parquet_file.schema_arrow.pandas_metadata["index_columns"][0]
+
+        features, row_groups, offsets = [], [], []
+        for row_group in range(parquet_file.num_row_groups):
+            ids = parquet_file.read_row_group(row_group, columns=[index_column]).column(0)
+
+            features.extend(ids.to_pylist())
+            row_groups.extend([row_group] * len(ids))
+            offsets.extend(range(len(ids)))
+
+        index = pd.DataFrame(
+            {"row_group": row_groups, "offset": offsets, "row": range(len(features))},
+            index=features,
+            dtype=np.int32,
+        )
+        index.to_pickle(source.replace(".parquet", ".index.pkl"))
+
+        logger.info(f"Exporting feature index for {source}: {index.shape[0]} features")
+
+
+@task
+def canonical_axis(processed_dir: str = PROCESSED_DIR) -> None:
+    """
+    Function exports canonical, sorted feature axis per platform [union of features of all processed frames].
+    Position of every feature on the canonical axis is added to sidecar index of each frame, which allows to
+    assemble frames of different sample groups by positional stacking instead of label alignment.
+
+    :param processed_dir:
+    :return: None
+    """
+    logger = get_run_logger()
+
+    for platform in ("RNA-Seq", "Methylation Array"):
+        sources = glob(join(processed_dir, "*", f"{platform}.index.pkl"))
+        indexes = [pd.read_pickle(source) for source in sources]
+
+        features = set()
+        for index in indexes:
+            features.update(index.index)
+
+        axis = pd.Index(sorted(features), name="")
+        pd.to_pickle(axis, join(processed_dir, f"{platform}.axis.pkl"))
+
+        for source, index in zip(sources, indexes):
+            index["position"] = axis.get_indexer(index.index).astype(np.int32)
+            index.to_pickle(source)
+
+        logger.info(f"Exporting canonical axis for {platform}: {axis.size} features")
+
+
+@task
+def feature_moments(processed_dir: str = PROCESSED_DIR) -> None:
+    """
+    Function exports sufficient statistics [n, sum, sum of squares] of each feature per processed frame.
+    Pooled variance of any combination of sample groups can be computed exactly from these moments,
+    without reading the frames.
+
+    :param processed_dir:
+    :return: None
+    """
+    logger = get_run_logger()
+
+    for source in tqdm(glob(join(processed_dir, "*", "*.parquet"))):
+        frame = read_frame(source)
+
+        moments = pd.DataFrame(
+            {
+                "n": frame.count(axis=1),
+                "sum": frame.sum(axis=1),
+                "sum_of_squares": (frame**2).sum(axis=1),
+            }
+        )
+        record = {"samples": frame.shape[1], "moments": moments}
+
+        with open(source.replace(".parquet", ".moments.pkl"), "wb") as moments_file:
+            pickle.dump(record, moments_file)
+
+        logger.info(f"Exporting feature moments for {source}")
+
+
+@task
+def export_ipc(processed_dir: str = PROCESSED_DIR) -> None:
+    """
+    Function exports uncompressed Arrow IPC [Feather v2] copy of each processed frame.
+    These files are memory-mapped by the app, so all workers share the same page cache without deserialization.
+    Missing values are stored as NaN instead of nulls, so float columns can be converted to pandas without a copy.
+    Encoded frames are copied as stored, encoding record is kept in schema metadata.
+
+    :param processed_dir:
+    :return: None
+    """
+    logger = get_run_logger()
+
+    for source in tqdm(glob(join(processed_dir, "*", "*.parquet"))):
+        table = pq.read_table(source)
+
+        for position, column in enumerate(table.columns):
+            if pa.types.is_floating(column.type):
+                table = table.set_column(
+                    position, table.field(position), pc.fill_null(column, np.nan)
+                )
+        feather.write_feather(
+            table, source.replace(".parquet", ".arrow"), compression="uncompressed"
+        )
+
+        logger.info(f"Exporting Arrow IPC copy of {source}")
+
+
 @task
 def clean_sample_sheet(
     processed_dir: str = PROCESSED_DIR, sample_sheet_path: str = SAMPLE_SHEET_FILE
@@ -589,6 +779,280 @@ def global_metadata(
     logger.info("Exporting global metadata file for current local repository.")
 
 
+@task
+def differential_analysis(
+    processed_dir: str = PROCESSED_DIR,
+    metadata_global_path: str = METADATA_GLOBAL_FILE,
+    output_dir: str = DIFFERENTIAL_DIR,
+    sample_type_pairs: List[List[str]] = DIFFERENTIAL_SAMPLE_TYPE_PAIRS,
+    threshold: float = MVF_THRESHOLD,
+    enabled: bool = DIFFERENTIAL_ANALYSIS,
+) -> None:
+    """
+    Function precomputes differential features [DEGs/DMPs] for configured pairs of sample groups, e.g. tumor vs
+    matched normal tissue. Statistics of each sample group are computed once [in parallel] and shared by all pairs
+    including this group, pairs are compared in parallel. Threshold independent records are exported per platform
+    as single parquet file with one row group per pair, so the app reads only the requested pair.
+    Pairs without common features are skipped, the app computes them live.
+
+    :param processed_dir:
+    :param metadata_global_path:
+    :param output_dir:
+    :param sample_type_pairs: pairs of sample types [A, B] to compare
+    :param threshold: quantile of pooled standard deviation [most variable features]
+    :param enabled:
+    :return: None
+    """
+    logger = get_run_logger()
+
+    if not enabled:
+        logger.info("Differential analysis disabled.")
+        return
+
+    global_metadata_file = pd.read_pickle(metadata_global_path)
+    makedirs(output_dir, exist_ok=True)
+
+    for platform, groups_key in (
+        ("RNA-Seq", "Expression_files_present"),
+        ("Methylation Array", "Methylation_files_present"),
+    ):
+        pairs = enumerate_pairs(global_metadata_file[groups_key], sample_type_pairs)
+        if not pairs:
+            logger.info(f"No pairs of sample groups to compare for {platform}")
+            continue
+
+        groups = sorted({group for pair in pairs for group in pair})
+        sources = [join(processed_dir, group, f"{platform}.parquet") for group in groups]
+
+        with TemporaryDirectory(dir=output_dir) as temp_dir, ProcessPoolExecutor(
+            N_PROCESS
+        ) as executor:
+            statistics = dict(
+                zip(groups, executor.map(group_statistics, sources, repeat(temp_dir)))
+            )
+            results = executor.map(
+                compare_pair,
+                [statistics[group_A] for group_A, _ in pairs],
+                [statistics[group_B] for _, group_B in pairs],
+                repeat(threshold),
+            )
+
+            writer = None
+            for (group_A, group_B), records in tqdm(zip(pairs, results), total=len(pairs)):
+                if records.empty:
+                    logger.info(f"No common features to compare for {group_A} vs {group_B}")
+                    continue
+
+                records.insert(0, "group_A", group_A)
+                records.insert(1, "group_B", group_B)
+                table = pa.Table.from_pandas(records, preserve_index=False)
+
+                if writer is None:
+                    writer = pq.ParquetWriter(join(output_dir, f"{platform}.parquet"), table.schema)
+                writer.write_table(table)
+
+            if writer is not None:
+                writer.close()
+
+        logger.info(f"Exporting differential features for {platform}: {len(pairs)} pairs")
+
+
+@task
+def feature_groups_index(
+    processed_dir: str = PROCESSED_DIR,
+    metadata_global_path: str = METADATA_GLOBAL_FILE,
+    output_file: str = FEATURE_GROUPS_INDEX_FILE,
+) -> None:
+    """
+    Function builds global inverted index: feature [gene or probe] -> set of sample groups containing it.
+    Set of sample groups is stored as a bitmap over groups ordering from global metadata file,
+    one packed row per feature.
+
+    :param processed_dir:
+    :param metadata_global_path:
+    :param output_file:
+    :return: None
+    """
+    logger = get_run_logger()
+    global_metadata_file = pd.read_pickle(metadata_global_path)
+    records = {}
+
+    for platform, groups_key, features_key in (
+        ("RNA-Seq", "Expression_files_present", "genes"),
+        ("Methylation Array", "Methylation_files_present", "probes"),
+    ):
+        groups = global_metadata_file[groups_key]
+        features_per_group = [
+            pd.read_pickle(join(processed_dir, group, "metadata.pkl"))[features_key] or set()
+            for group in groups
+        ]
+
+        features = pd.Index(sorted(set().union(*features_per_group)))
+        membership = np.zeros((features.size, len(groups)), dtype=bool)
+
+        for position, group_features in enumerate(features_per_group):
+            membership[:, position] = features.isin(group_features)
+
+        record = FeatureGroupsRecord(
+            groups,
+            np.array([feature.encode() for feature in features], dtype=np.bytes_),
+            np.packbits(membership, axis=1),
+        )
+        records[platform] = record.record
+
+        logger.info(f"Exporting feature index for {platform}: {features.size} features")
+
+    with open(output_file, "wb") as index_file:
+        pickle.dump(records, index_file)
+
+
+@task
+def feature_major_store(
+    processed_dir: str = PROCESSED_DIR, metadata_global_path: str = METADATA_GLOBAL_FILE
+) -> None:
+    """
+    Function builds pan-cancer, feature-major store per platform: single [features x samples] array on canonical
+    feature axis holding values of all samples of all sample groups, one contiguous row per feature.
+    Array is stored as .npy file, so it can be memory-mapped, along with sample -> sample group map. Values are
+    stored in dtype of processed frames [float32 for float32 and uint16 encodings, see src.encoding.storage_dtype]
+    unless any of them is stored as float64. Features absent in sample group are stored as NaNs.
+
+    :param processed_dir:
+    :param metadata_global_path:
+    :return: None
+    """
+    logger = get_run_logger()
+    global_metadata_file = pd.read_pickle(metadata_global_path)
+
+    for platform, groups_key in (
+        ("RNA-Seq", "Expression_files_present"),
+        ("Methylation Array", "Methylation_files_present"),
+    ):
+        groups = global_metadata_file[groups_key]
+        axis = pd.read_pickle(join(processed_dir, f"{platform}.axis.pkl"))
+        schemas = [
+            pq.read_schema(join(processed_dir, group, f"{platform}.parquet")) for group in groups
+        ]
+        dtype = np.result_type(
+            *[storage_dtype(parse_encoding(schema.metadata)) for schema in schemas], np.float32
+        )
+
+        samples = [
+            (sample, group)
+            for group, schema in zip(groups, schemas)
+            for sample in schema.names
+            if sample not in schema.pandas_metadata["index_columns"]
+        ]
+        sample_map = pd.Series(
+            [group for _, group in samples],
+            index=[sample for sample, _ in samples],
+            name="SampleType",
+        )
+
+        store = np.lib.format.open_memmap(
+            join(processed_dir, f"{platform}.feature_major.npy"),
+            mode="w+",
+            dtype=dtype,
+            shape=(axis.size, sample_map.size),
+        )
+
+        start = 0
+        for group in tqdm(groups):
+            frame = read_frame(join(processed_dir, group, f"{platform}.parquet"))
+            positions = axis.get_indexer(frame.index)
+            missing = np.ones(axis.size, dtype=bool)
+            missing[positions] = False
+
+            store[positions, start : start + frame.shape[1]] = frame.to_numpy(dtype=dtype)
+            store[missing, start : start + frame.shape[1]] = np.nan
+            start += frame.shape[1]
+
+        store.flush()
+        del store
+
+        sample_map.to_pickle(join(processed_dir, f"{platform}.feature_major.samples.pkl"))
+        logger.info(
+            f"Exporting feature-major store for {platform}: {axis.size} features, {sample_map.size} samples"
+        )
+
+
+@task
+def download_artifacts(
+    processed_dir: str = PROCESSED_DIR, downloads_dir: str = DOWNLOADS_DIR
+) -> None:
+    """
+    Function exports download artifacts of each processed frame: gzip-compressed CSV, parquet and Arrow IPC,
+    all with decoded values. Artifacts do not change between pipeline runs, so the app serves them as static files.
+
+    :param processed_dir:
+    :param downloads_dir:
+    :return: None
+    """
+    logger = get_run_logger()
+
+    for source in tqdm(glob(join(processed_dir, "*", "*.parquet"))):
+        sample_group, platform = Path(source).parent.name, Path(source).stem
+        makedirs(join(downloads_dir, sample_group), exist_ok=True)
+
+        target = join(downloads_dir, sample_group, platform)
+
+        frame = read_frame(source)
+        frame.to_csv(f"{target}.csv.gz", compression="gzip")
+        frame.to_parquet(f"{target}.parquet", compression="zstd")
+        feather.write_feather(
+            pa.Table.from_pandas(frame, preserve_index=True), f"{target}.arrow", compression="zstd"
+        )
+
+        logger.info(f"Exporting download artifacts for {sample_group}: {platform}")
+
+
+@task
+def storage_report(
+    processed_dir: str = PROCESSED_DIR, output_file: str = STORAGE_REPORT_FILE
+) -> None:
+    """
+    Function measures achieved compression ratio and read throughput of each processed frame.
+    Compression ratio is the size of decoded [float64] values over the size of parquet file, throughput is
+    expressed in MB of decoded values per second, best of 3 reads.
+
+    :param processed_dir:
+    :param output_file:
+    :return: None
+    """
+    logger = get_run_logger()
+    records = []
+
+    for source in tqdm(glob(join(processed_dir, "*", "*.parquet"))):
+        read_seconds = []
+        for _ in range(3):
+            start = perf_counter()
+            frame = read_frame(source)
+            read_seconds.append(perf_counter() - start)
+
+        encoding = read_encoding(source) or {"encoding": "float64", "layout": "snappy"}
+        raw_bytes = frame.memory_usage(index=False).sum()
+        file_bytes = getsize(source)
+
+        records.append(
+            {
+                "SampleGroup": Path(source).parent.name,
+                "Platform": Path(source).stem,
+                "encoding": encoding["encoding"],
+                "layout": encoding.get("layout", "snappy"),
+                "bytes": file_bytes,
+                "compression_ratio": raw_bytes / file_bytes,
+                "throughput_mb_s": raw_bytes / min(read_seconds) / 1e6,
+            }
+        )
+
+    report = pd.DataFrame(records).set_index(["SampleGroup", "Platform"]).sort_index()
+    report.to_pickle(output_file)
+
+    logger.info(
+        f"Exporting storage report:\n{report.groupby(level='Platform').mean(numeric_only=True)}"
+    )
+
+
 @task
 def create_repo_summary(
     output_file: str = SUMMARY_METAFILE,
@@ -654,8 +1118,17 @@ def run():
     build_exp_frame()
 
     metadata()
+    feature_index()
+    canonical_axis()
+    feature_moments()
+    export_ipc()
     clean_sample_sheet()
     global_metadata()
+    differential_analysis()
+    feature_groups_index()
+    feature_major_store()
+    download_artifacts()
+    storage_report()
     create_repo_summary()
 
 
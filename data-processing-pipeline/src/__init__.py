@@ -0,0 +1,6 @@
+import sys
+from pathlib import Path
+
+# modules shared with the app [encoding, differential engine] are imported from app/src,
+# so the app and the pipeline use a single implementation
+sys.path.append(str(Path(__file__).resolve().parents[2]))
@@ -0,0 +1,100 @@
+import pickle
+import typing as t
+from os.path import join
+
+import numpy as np
+import pandas as pd
+
+from app.src.differential_features import compare_summaries, summarize_group
+
+from .encoding import read_frame
+
+
+def enumerate_pairs(
+    sample_groups: t.List[str], sample_type_pairs: t.List[t.List[str]]
+) -> t.List[t.Tuple[str, str]]:
+    """
+    Function enumerates pairs of sample groups to compare. Sample groups are named
+    <sample type>_<tissue or organ of origin>_<primary diagnosis>, groups are paired if they share tissue and diagnosis
+    and their sample types form one of the configured pairs, e.g. tumor vs matched normal.
+
+    :param sample_groups:
+    :param sample_type_pairs: pairs of sample types [A, B]
+    :return List[Tuple[str, str]]:
+    """
+    present = set(sample_groups)
+    pairs = []
+
+    for sample_type_a, sample_type_b in sample_type_pairs:
+        for sample_group in sorted(sample_groups):
+            sample_type, _, origin = sample_group.partition("_")
+            if sample_type == sample_type_a and f"{sample_type_b}_{origin}" in present:
+                pairs.append((sample_group, f"{sample_type_b}_{origin}"))
+
+    return pairs
+
+
+def group_statistics(source: str, output_dir: str) -> str:
+    """
+    Function reads processed frame of a sample group once and exports per-feature statistics shared by all pairs
+    including this group: moments [selection of most variable features] and summary of the group used by the
+    differential engine [mean, variance, normality, deviations from median]. Values are exported as .npy array,
+    so pairs read only the rows they need. Only features without missing values are considered.
+
+    :param source: path to processed frame
+    :param output_dir:
+    :return str: path to exported statistics
+    """
+    frame = read_frame(source).dropna(axis=0)
+    values = frame.to_numpy(dtype=np.float64)
+
+    statistics = summarize_group(values)
+    statistics.index = frame.index
+    statistics["sum"] = values.sum(axis=1)
+    statistics["sum_of_squares"] = (values**2).sum(axis=1)
+
+    name = source.replace("/", "_")
+    values_path = join(output_dir, f"{name}.npy")
+    statistics_path = join(output_dir, f"{name}.pkl")
+
+    np.save(values_path, values)
+    with open(statistics_path, "wb") as file:
+        pickle.dump({"n": values.shape[1], "statistics": statistics, "values": values_path}, file)
+
+    return statistics_path
+
+
+def compare_pair(statistics_a: str, statistics_b: str, threshold: float) -> pd.DataFrame:
+    """
+    Function compares two sample groups using their exported statistics. As in the app, only the most variable
+    features [pooled standard deviation above threshold quantile] without missing values in both groups are tested.
+    Records are threshold independent and computed by the differential engine of the app, Mean(A) and Mean(B)
+    hold means of group A and group B.
+
+    :param statistics_a: path to statistics of group A
+    :param statistics_b: path to statistics of group B
+    :param threshold: quantile of pooled standard deviation
+    :return pd.DataFrame: record per feature, empty if groups have no common features
+    """
+    with open(statistics_a, "rb") as file_a, open(statistics_b, "rb") as file_b:
+        record_a, record_b = pickle.load(file_a), pickle.load(file_b)
+
+    n_a, n_b = record_a["n"], record_b["n"]
+    common = record_a["statistics"].index.intersection(record_b["statistics"].index)
+    stats_a, stats_b = record_a["statistics"].loc[common], record_b["statistics"].loc[common]
+
+    if not common.empty:
+        n = n_a + n_b
+        total = stats_a["sum"].values + stats_b["sum"].values
+        total_of_squares = stats_a["sum_of_squares"].values + stats_b["sum_of_squares"].values
+        std = np.sqrt(np.clip((total_of_squares - total**2 / n) / (n - 1), 0, None))
+
+        selected = std >= np.quantile(std, threshold)
+        stats_a, stats_b = stats_a[selected], stats_b[selected]
+
+    values_a = np.load(record_a["values"], mmap_mode="r")
+    values_b = np.load(record_b["values"], mmap_mode="r")
+    values_a = values_a[record_a["statistics"].index.get_indexer(stats_a.index)]
+    values_b = values_b[record_b["statistics"].index.get_indexer(stats_b.index)]
+
+    return compare_summaries(stats_a.index, values_a, values_b, stats_a, stats_b, "A", "B")
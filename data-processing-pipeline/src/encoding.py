@@ -0,0 +1,211 @@
+import json
+import typing as t
+from time import perf_counter
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from app.src.encoding import METADATA_KEY, decode_frame, parse_encoding
+from app.src.exceptions import UnknownEncoding
+
+# Fixed-point encoding of beta values [0, 1]: value = code / UINT16_SCALE, resolution ~1.5e-5.
+# The highest code is reserved for missing values.
+UINT16_SCALE = 65534
+UINT16_MISSING = 65535
+
+ENCODINGS = ("float64", "float32", "uint16")
+
+# Lossless parquet layouts of encoded values. Dictionary encoding [default] stores runs of repeated values,
+# e.g. zeros dominating RNA-seq frames, as RLE runs of dictionary codes, byte stream split makes float bytes
+# compressible when values are mostly unique.
+LAYOUTS = {
+    "snappy": {"compression": "snappy"},
+    "zstd": {"compression": "zstd"},
+    "byte-stream-split": {
+        "compression": "zstd",
+        "use_dictionary": False,
+        "use_byte_stream_split": True,
+    },
+}
+
+
+def encode_frame(frame: pd.DataFrame, encoding: str) -> t.Tuple[pd.DataFrame, dict]:
+    """
+    Function encodes values of processed frame for storage.
+
+    :param frame:
+    :param encoding: one of float64 [no encoding], float32, uint16 [fixed-point, only for values in [0, 1]]
+    :return pd.DataFrame, dict: encoded frame, encoding record required to decode it
+    """
+    if encoding == "float64":
+        return frame, {"encoding": "float64"}
+
+    if encoding == "float32":
+        return frame.astype(np.float32), {"encoding": "float32"}
+
+    if encoding == "uint16":
+        values = frame.to_numpy(dtype=np.float64)
+        if np.nanmin(values) < 0 or np.nanmax(values) > 1:
+            raise ValueError("uint16 encoding is applicable only to values in [0, 1].")
+
+        codes = np.rint(values * UINT16_SCALE)
+        codes[np.isnan(codes)] = UINT16_MISSING
+        encoded = pd.DataFrame(codes.astype(np.uint16), index=frame.index, columns=frame.columns)
+
+        return encoded, {"encoding": "uint16", "scale": UINT16_SCALE, "missing": UINT16_MISSING}
+
+    raise UnknownEncoding(f"Unknown encoding: {encoding}, available: {ENCODINGS}.")
+
+
+def read_encoding(path: str) -> t.Optional[dict]:
+    """
+    Function reads encoding record from parquet schema metadata.
+
+    :param path:
+    :return Optional[dict]:
+    """
+    return parse_encoding(pq.read_schema(path).metadata)
+
+
+def storage_dtype(record: t.Optional[dict]) -> np.dtype:
+    """
+    Function returns dtype sufficient to hold decoded values of processed frame: float32 for float32 and uint16
+    encodings [decoded uint16 codes are held with relative error <= 6e-8, far below their resolution], float64 for
+    float64 frames and frames written without encoding.
+
+    :param record: encoding record, None for frames written without encoding
+    :return np.dtype:
+    """
+    if record is not None and record["encoding"] in ("float32", "uint16"):
+        return np.dtype(np.float32)
+
+    return np.dtype(np.float64)
+
+
+def _to_table(frame: pd.DataFrame, encoding: str, layout: str) -> pa.Table:
+    """
+    Function encodes frame and converts it to Arrow table with encoding record in schema metadata.
+
+    :param frame:
+    :param encoding:
+    :param layout:
+    :return pa.Table:
+    """
+    if layout not in LAYOUTS:
+        raise UnknownEncoding(f"Unknown layout: {layout}, available: {tuple(LAYOUTS)}.")
+
+    frame, record = encode_frame(frame, encoding)
+    table = pa.Table.from_pandas(frame, preserve_index=True)
+
+    metadata = {
+        **(table.schema.metadata or {}),
+        METADATA_KEY: json.dumps({**record, "layout": layout}).encode(),
+    }
+    return table.replace_schema_metadata(metadata)
+
+
+def _write_table(table: pa.Table, sink: t.Any, row_group_size: int, layout: str) -> None:
+    """
+    Function writes Arrow table to parquet sink using requested layout.
+
+    :param table:
+    :param sink: path or Arrow output stream
+    :param row_group_size:
+    :param layout:
+    :return None:
+    """
+    options = dict(LAYOUTS[layout])
+    if options.get("use_byte_stream_split"):
+        options["use_byte_stream_split"] = [
+            field.name for field in table.schema if pa.types.is_floating(field.type)
+        ]
+
+    pq.write_table(table, sink, row_group_size=row_group_size, write_statistics=True, **options)
+
+
+def write_frame(
+    frame: pd.DataFrame, path: str, encoding: str, row_group_size: int, layout: str = "snappy"
+) -> None:
+    """
+    Function writes processed frame to parquet file using requested encoding and layout.
+    Encoding record is stored in parquet schema metadata.
+
+    :param frame:
+    :param path:
+    :param encoding:
+    :param row_group_size:
+    :param layout:
+    :return None:
+    """
+    table = _to_table(frame, encoding, layout)
+    _write_table(table, path, row_group_size, layout)
+
+
+def benchmark_layouts(
+    frame: pd.DataFrame, encoding: str, row_group_size: int, repeats: int = 3
+) -> pd.DataFrame:
+    """
+    Function measures size and read throughput of frame written with each of available layouts.
+    Throughput is expressed in MB of decoded [float64] data per second, best of repeats.
+
+    :param frame:
+    :param encoding:
+    :param row_group_size:
+    :param repeats:
+    :return pd.DataFrame:
+    """
+    raw_bytes = frame.memory_usage(index=False).sum()
+    records = []
+
+    for layout in LAYOUTS:
+        table = _to_table(frame, encoding, layout)
+        sink = pa.BufferOutputStream()
+        _write_table(table, sink, row_group_size, layout)
+        buffer = sink.getvalue()
+
+        read_seconds = []
+        for _ in range(repeats):
+            start = perf_counter()
+            decoded = pq.read_table(pa.BufferReader(buffer)).to_pandas()
+            decode_frame(decoded, json.loads(table.schema.metadata[METADATA_KEY]))
+            read_seconds.append(perf_counter() - start)
+
+        records.append(
+            {
+                "layout": layout,
+                "bytes": buffer.size,
+                "compression_ratio": raw_bytes / buffer.size,
+                "read_seconds": min(read_seconds),
+                "throughput_mb_s": raw_bytes / min(read_seconds) / 1e6,
+            }
+        )
+
+    return pd.DataFrame(records).set_index("layout")
+
+
+def select_layout(benchmark: pd.DataFrame, max_read_slowdown: float) -> str:
+    """
+    Function selects the smallest layout among layouts read at most max_read_slowdown times slower than
+    the fastest one.
+
+    :param benchmark: output of benchmark_layouts
+    :param max_read_slowdown:
+    :return str:
+    """
+    fastest = benchmark["read_seconds"].min()
+    candidates = benchmark[benchmark["read_seconds"] <= fastest * max_read_slowdown]
+
+    return str(candidates["bytes"].idxmin())
+
+
+def read_frame(path: str, **kwargs) -> pd.DataFrame:
+    """
+    Function reads processed frame from parquet file and decodes its values.
+
+    :param path:
+    :param kwargs: passed to pd.read_parquet
+    :return pd.DataFrame:
+    """
+    return decode_frame(pd.read_parquet(path, **kwargs), read_encoding(path))
@@ -2,6 +2,7 @@ import typing as t
 from dataclasses import dataclass, field
 from datetime import datetime
 
+from numpy import ndarray
 from pandas import Series
 
 
@@ -51,6 +52,22 @@ class GlobalMetaRecord:
         }
 
 
+@dataclass(frozen=True)
+class FeatureGroupsRecord:
+    groups: t.List[str]
+    features: ndarray
+    bitmap: ndarray
+
+    @property
+    def record(self) -> dict:
+        return {
+            "creationDate": datetime.now().strftime("%d/%m/%Y %H:%M:%S"),
+            "groups": self.groups,
+            "features": self.features,
+            "bitmap": self.bitmap,
+        }
+
+
 @dataclass(frozen=True)
 class RepositorySummary:
     last_update: str
@@ -5,8 +5,21 @@ from glob import glob
 from os.path import exists, join
 from pathlib import Path
 
+import numpy as np
 import pandas as pd
+import pyarrow.parquet as pq
 from src.collector import SamplesCollector
+from src.differential import compare_pair, enumerate_pairs, group_statistics
+from src.encoding import (
+    UINT16_SCALE,
+    benchmark_layouts,
+    decode_frame,
+    encode_frame,
+    read_encoding,
+    read_frame,
+    select_layout,
+    storage_dtype,
+)
 from tqdm import tqdm
 
 with open("config.json", "r", encoding="utf-8") as file:
@@ -347,6 +360,172 @@ def test_metadata() -> None:
             ), "Methylation samples set wrongly specified."
 
 
+def test_feature_index() -> None:
+    """
+    Test to check if sidecar feature index points to the correct rows of processed frames.
+
+    :return:
+    """
+    for source in tqdm(glob("data/processed/*/*.parquet")):
+        index = pd.read_pickle(source.replace(".parquet", ".index.pkl"))
+        frame = pd.read_parquet(source)
+
+        assert list(index.index) == list(frame.index), "Index does not cover all features."
+
+        parquet_file = pq.ParquetFile(source)
+        row_group, offset = index[["row_group", "offset"]].iloc[-1]
+        record = parquet_file.read_row_group(row_group).to_pandas().iloc[offset]
+
+        assert record.name == index.index[-1], "Feature index points to a wrong row."
+
+
+def test_canonical_axis() -> None:
+    """
+    Test to check if positions in sidecar feature index point to the correct features of canonical axis.
+
+    :return:
+    """
+    for platform in ("RNA-Seq", "Methylation Array"):
+        axis = pd.read_pickle(f"data/processed/{platform}.axis.pkl")
+
+        assert axis.is_monotonic_increasing and axis.is_unique, "Canonical axis is not sorted."
+
+        for source in tqdm(glob(f"data/processed/*/{platform}.index.pkl")):
+            index = pd.read_pickle(source)
+
+            assert (axis[index["position"]] == index.index).all(), "Wrong axis positions."
+
+
+def test_feature_major_store() -> None:
+    """
+    Test to check if feature-major store holds the same values as processed frames.
+
+    :return:
+    """
+    for platform in ("RNA-Seq", "Methylation Array"):
+        axis = pd.read_pickle(f"data/processed/{platform}.axis.pkl")
+        store = np.load(f"data/processed/{platform}.feature_major.npy", mmap_mode="r")
+        sample_map = pd.read_pickle(f"data/processed/{platform}.feature_major.samples.pkl")
+
+        assert store.shape == (axis.size, sample_map.size), "Wrong shape of feature-major store."
+
+        dtype = max(
+            storage_dtype(read_encoding(f"data/processed/{group}/{platform}.parquet"))
+            for group in sample_map.unique()
+        )
+        assert store.dtype == dtype, "Feature-major store should keep dtype of processed frames."
+
+        group = sample_map.iloc[0]
+        frame = read_frame(f"data/processed/{group}/{platform}.parquet")
+        columns = np.flatnonzero(sample_map.values == group)
+        values = store[axis.get_indexer(frame.index)][:, columns]
+
+        assert list(sample_map.index[columns]) == list(frame.columns), "Wrong sample map."
+        expected = frame.to_numpy(dtype=dtype)
+        assert np.array_equal(values, expected, equal_nan=True), "Wrong values."
+
+        missing = np.ones(axis.size, dtype=bool)
+        missing[axis.get_indexer(frame.index)] = False
+        absent = store[np.flatnonzero(missing)[:, None], columns]
+        assert np.isnan(absent).all(), "Absent features should be stored as NaNs."
+
+
+def test_feature_moments() -> None:
+    """
+    Test to check if feature moments are consistent with processed frames.
+
+    :return:
+    """
+    for source in tqdm(glob("data/processed/*/*.parquet")):
+        record = pd.read_pickle(source.replace(".parquet", ".moments.pkl"))
+        frame = read_frame(source)
+        moments = record["moments"]
+
+        assert record["samples"] == frame.shape[1], "Wrong number of samples."
+        assert moments.index.equals(frame.index), "Moments do not cover all features."
+        assert np.allclose(moments["sum"], frame.sum(axis=1)), "Sums wrongly specified."
+        assert np.allclose(
+            moments["sum_of_squares"], (frame**2).sum(axis=1)
+        ), "Sums of squares wrongly specified."
+
+
+def test_encoding() -> None:
+    """
+    Test to check if encoded frames are decoded back to float64 within encoding resolution.
+
+    :return:
+    """
+    frame = pd.DataFrame(np.random.rand(100, 5), columns=list("ABCDE"))
+    frame.iloc[3, 2] = np.nan
+
+    for encoding, resolution in (("float64", 0), ("float32", 1e-7), ("uint16", 0.5 / UINT16_SCALE)):
+        decoded = decode_frame(*encode_frame(frame, encoding))
+
+        assert (decoded.dtypes == np.float64).all(), "Frame is not decoded to float64."
+        assert decoded.isna().equals(frame.isna()), "Missing values are not preserved."
+        assert np.nanmax(np.abs(decoded.values - frame.values)) <= resolution, "Wrong values."
+
+
+def test_met_frames_encoding() -> None:
+    """
+    Test to check if methylation frames are stored using configured encoding.
+
+    :return:
+    """
+    for source in tqdm(glob("data/processed/*/Methylation Array.parquet")):
+        assert (
+            read_encoding(source)["encoding"] == config["METHYLATION_ENCODING"]
+        ), "Wrong encoding."
+
+
+def test_layout_benchmark() -> None:
+    """
+    Test to check if layout benchmark covers all layouts and selected layout is the smallest acceptable one.
+
+    :return:
+    """
+    frame = pd.DataFrame(np.random.rand(1000, 5) * (np.random.rand(1000, 5) > 0.7))
+    frame.columns = frame.columns.astype(str)
+    benchmark = benchmark_layouts(frame, "float64", row_group_size=100, repeats=1)
+
+    assert (benchmark["compression_ratio"] > 0).all(), "Wrong compression ratio."
+    assert select_layout(benchmark, np.inf) == benchmark["bytes"].idxmin(), "Wrong layout selected."
+
+
+def test_storage_report() -> None:
+    """
+    Test to check if storage report covers all processed frames.
+
+    :return:
+    """
+    report = pd.read_pickle(config["STORAGE_REPORT_FILE"])
+    sources = glob("data/processed/*/*.parquet")
+
+    assert report.shape[0] == len(sources), "Storage report does not cover all frames."
+    assert (report["compression_ratio"] > 0).all(), "Wrong compression ratio."
+    assert (report["throughput_mb_s"] > 0).all(), "Wrong read throughput."
+
+
+def test_download_artifacts() -> None:
+    """
+    Test to check if download artifacts exist for each processed frame and contain all features.
+
+    :return:
+    """
+    for source in tqdm(glob("data/processed/*/*.parquet")):
+        sample_group, platform = Path(source).parent.name, Path(source).stem
+        target = join(config["DOWNLOADS_DIR"], sample_group, platform)
+        frame = read_frame(source)
+
+        csv_frame = pd.read_csv(f"{target}.csv.gz", index_col=0)
+        parquet_frame = pd.read_parquet(f"{target}.parquet")
+        arrow_frame = pd.read_feather(f"{target}.arrow")
+
+        assert csv_frame.shape == frame.shape, "Wrong shape of CSV artifact."
+        assert parquet_frame.equals(frame), "Parquet artifact does not match processed frame."
+        assert arrow_frame.equals(frame), "Arrow IPC artifact does not match processed frame."
+
+
 def test_global_metadata() -> None:
     """
     Test to check if global metadata object contains an appropriate number of sample types, met frames and exp frames.
@@ -373,3 +552,105 @@ def test_global_metadata() -> None:
     assert expected_met_files == set(
         global_metadata["Methylation_files_present"]
     ), "Set of methylation frames wrongly specified."
+
+
+def test_feature_groups_index() -> None:
+    """
+    Test to check if global inverted feature index is consistent with metadata of sample groups.
+
+    :return:
+    """
+    index = pd.read_pickle(config["FEATURE_GROUPS_INDEX_FILE"])
+
+    for platform, features_key in (("RNA-Seq", "genes"), ("Methylation Array", "probes")):
+        record = index[platform]
+        membership = np.unpackbits(record["bitmap"], axis=1, count=len(record["groups"]))
+
+        assert membership.shape[0] == record["features"].size, "Bitmap shape wrongly specified."
+
+        for position, group in enumerate(record["groups"]):
+            metadata = pd.read_pickle(join(config["PROCESSED_DIR"], group, "metadata.pkl"))
+            features = {
+                feature.decode() for feature in record["features"][membership[:, position] == 1]
+            }
+
+            assert features == metadata[features_key], f"Wrong set of features for {group}."
+
+
+def test_differential_results() -> None:
+    """
+    Test to check if precomputed differential results hold one row group per configured pair of sample groups
+    [pairs without common features are skipped].
+
+    :return:
+    """
+    if not config["DIFFERENTIAL_ANALYSIS"]:
+        return
+
+    global_metadata = pd.read_pickle(config["METADATA_GLOBAL_FILE"])
+
+    for platform, groups_key in (
+        ("RNA-Seq", "Expression_files_present"),
+        ("Methylation Array", "Methylation_files_present"),
+    ):
+        pairs = enumerate_pairs(
+            global_metadata[groups_key], config["DIFFERENTIAL_SAMPLE_TYPE_PAIRS"]
+        )
+        if not pairs:
+            continue
+
+        path = join(config["DIFFERENTIAL_DIR"], f"{platform}.parquet")
+        records = pd.read_parquet(path)
+        stored = [
+            tuple(pair)
+            for pair in records[["group_A", "group_B"]].drop_duplicates().itertuples(index=False)
+        ]
+
+        assert pq.ParquetFile(path).num_row_groups == len(stored), "Wrong number of row groups."
+        assert stored == [pair for pair in pairs if pair in stored], "Wrong pairs of sample groups."
+        pvalues = records.filter(like="p-value").to_numpy()
+        assert np.all(np.isnan(pvalues) | ((pvalues >= 0) & (pvalues <= 1))), "Wrong p-values."
+
+
+def test_compare_pair(tmp_path) -> None:
+    """
+    Test to check if precomputed results of a pair equal results of the app for the same frames.
+
+    :return:
+    """
+    # engine of the app is importable once src.differential is imported
+    from app.src.differential_features import DifferentialFeatures
+
+    rng = np.random.default_rng(0)
+    features = [f"cg{i:08d}" for i in range(300)]
+    frame_a = pd.DataFrame(rng.beta(2, 3, (300, 12)), index=features).add_prefix("A")
+    frame_b = pd.DataFrame(rng.beta(3, 2, (300, 7)), index=features).add_prefix("B")
+    frame_a.iloc[:5, 0] = np.nan
+    frame_b = frame_b.drop(index=features[-10:])
+
+    paths = []
+    for name, frame in (("A", frame_a), ("B", frame_b)):
+        frame.to_parquet(join(tmp_path, f"{name}.parquet"))
+        paths.append(group_statistics(join(tmp_path, f"{name}.parquet"), str(tmp_path)))
+
+    records = compare_pair(*paths, threshold=0.9)
+
+    data = pd.concat([frame_a, frame_b], axis=1).dropna(axis=0)
+    std = data.std(axis=1)
+    data = data.loc[std >= std.quantile(0.9)]
+    samples = pd.Series(["A"] * 12 + ["B"] * 7, index=data.columns)
+
+    expected = DifferentialFeatures("Methylation [450K/EPIC]", data, samples, "A", "B", 0.05, 0.1)
+    expected.identify_differential_features()
+
+    pd.testing.assert_frame_equal(
+        records.set_index("Feature").sort_index(),
+        expected.records.set_index("Feature").sort_index(),
+        check_names=False,
+    )
+
+    frame_c = frame_b.rename(index=lambda feature: f"x{feature}")
+    frame_c.to_parquet(join(tmp_path, "C.parquet"))
+    disjoint = group_statistics(join(tmp_path, "C.parquet"), str(tmp_path))
+
+    assert compare_pair(paths[0], disjoint, threshold=0.9).empty, "Disjoint groups compared."